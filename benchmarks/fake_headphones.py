@@ -0,0 +1,147 @@
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+# Album queries sent by the importer look like "Artist - Album Name (2001)", apart from some fallback searches
+_QUERY = re.compile(r"^(?P<artist>.*?) - (?P<title>.*?)(?: \((?P<year>[^)]*)\))?$")
+
+
+class FakeHeadphones:
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, result_count: int = 5, miss_rate: float = 0.0,
+                 seed: Optional[int] = 0):
+        """
+        A local stand-in for the headphones API, for benchmarking the importer without a real server.
+        Implements `findAlbum`, `addAlbum`, `queueAlbum`, and empty versions of the library commands.
+        :param latency: Optional. How many seconds each request takes.
+        :param error_rate: Optional. The fraction of requests, from 0 to 1, which fail with a 503.
+        :param result_count: Optional. How many results `findAlbum` returns, only one of which is the album.
+        :param miss_rate: Optional. The fraction of albums, from 0 to 1, which `findAlbum` can't find.
+        :param seed: Optional. The seed for the random errors and misses.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.result_count = result_count
+        self.miss_rate = miss_rate
+        self.requests = Counter()
+        self.errors = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections open between requests, like headphones does
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-headphones", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        params = {key: values[0] for key, values in parse_qs(urlparse(handler.path).query).items()}
+        cmd = params.get("cmd")
+
+        with self._lock:
+            self.requests[cmd] += 1
+            failed = self._random.random() < self.error_rate
+            missed = self._random.random() < self.miss_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if failed:
+            with self._lock:
+                self.errors[cmd] += 1
+            self._send(handler, 503, {"error": "Service Unavailable"})
+        elif cmd == "findAlbum":
+            self._send(handler, 200, [] if missed else self._find_album(params.get("name", "")))
+        elif cmd in ("addAlbum", "queueAlbum"):
+            self._send(handler, 200, "OK")
+        elif cmd in ("getWanted", "getSnatched", "getIndex"):
+            self._send(handler, 200, [])
+        elif cmd == "getArtist":
+            self._send(handler, 200, {"artist": [], "albums": [], "description": []})
+        else:
+            self._send(handler, 400, {"error": "Unknown command: {}".format(cmd)})
+
+    def _find_album(self, name: str) -> list:
+        query = _QUERY.match(name)
+        if query:
+            artist, title, year = query.group("artist"), query.group("title"), query.group("year") or ""
+        else:
+            # Fallback searches may only send the album name
+            artist, title, year = "", name, ""
+
+        results = [self._result(artist, title, year, 100)]
+        for number in range(1, self.result_count):
+            results.append(self._result(
+                "{} Tribute Band {}".format(artist, number), "{} Vol. {}".format(title, number), year, 90 - number
+            ))
+
+        return results
+
+    @staticmethod
+    def _result(artist: str, title: str, year: str, score: int) -> dict:
+        album_id = "{:08x}-0000-0000-0000-000000000000".format(zlib.crc32("{}\0{}".format(artist, title).encode()))
+        return {
+            "uniquename": artist,
+            "title": title,
+            "id": "artist-" + album_id,
+            "albumid": album_id,
+            "url": "",
+            "albumurl": "",
+            "score": score,
+            "date": year,
+            "country": "XW",
+            "formats": "Digital Media",
+            "tracks": 10,
+            "rgid": album_id,
+            "rgtype": "Album",
+        }
+
+    @staticmethod
+    def _send(handler: BaseHTTPRequestHandler, status: int, body):
+        data = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+__all__ = ["FakeHeadphones"]
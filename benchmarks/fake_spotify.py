@@ -0,0 +1,219 @@
+import base64
+import json
+import re
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+_PLAYLIST_PATH = re.compile(r"^/v1/playlists/(?P<id>[A-Za-z0-9]+)(?P<tracks>/tracks)?$")
+
+
+def fake_track(number: int, album: int, artist: Optional[int] = None) -> dict:
+    """
+    A track object like those of the Spotify Web API, with only the fields the importer requests.
+    :param number: The number of the track, which makes its URI and name.
+    :param album: The number of its album.
+    :param artist: Optional. The number of its artist. Defaults to `album`.
+    """
+    artist = {"name": "Artist {}".format(album if artist is None else artist)}
+    return {
+        "type": "track",
+        "uri": "spotify:track:{}".format(number),
+        "name": "Track {}".format(number),
+        "artists": [artist],
+        "album": {
+            "uri": "spotify:album:{}".format(album),
+            "name": "Album {}".format(album),
+            "artists": [artist],
+            "release_date": "{}-01-01".format(1960 + album % 60),
+        },
+    }
+
+
+class FakeSpotify:
+    def __init__(self, client_id: str = "client", client_secret: str = "secret"):
+        """
+        A local stand-in for the Spotify Web API and accounts service, for testing `SpotifySource` without spotify.
+        Implements playlists and their tracks, saved tracks, and issuing tokens with the client credentials and refresh
+        token flows. Use `url` as the accounts URL and `api_url` as the API URL.
+        :param client_id: Optional. The client ID tokens are issued to.
+        :param client_secret: Optional. The client secret tokens are issued to.
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.playlists = {}
+        self.saved_tracks = []
+        self.token = "token-0"
+        self.requests = Counter()
+        self.offsets = []
+        self._versions = Counter()
+        self._tokens_issued = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @property
+    def api_url(self) -> str:
+        return self.url + "/v1"
+
+    def set_playlist(self, playlist_id: str, tracks: "list[dict]", name: Optional[str] = None):
+        """
+        Creates or replaces a playlist, which gives it a new snapshot ID.
+        """
+        with self._lock:
+            self._versions[playlist_id] += 1
+            self.playlists[playlist_id] = dict(name=name or "Playlist {}".format(playlist_id), tracks=list(tracks))
+
+    def set_saved_tracks(self, tracks: "list[dict]"):
+        """
+        Replaces the saved tracks, which changes their `ETag`.
+        """
+        with self._lock:
+            self._versions["saved-tracks"] += 1
+            self.saved_tracks = list(tracks)
+
+    def expire_token(self):
+        """
+        Makes the current token invalid, so requests with it fail with `401` until a new one is issued.
+        """
+        with self._lock:
+            self.token = None
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle_get(self)
+
+            def do_POST(self):
+                fake._handle_token(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-spotify", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _handle_token(self, handler: BaseHTTPRequestHandler):
+        form = parse_qs(handler.rfile.read(int(handler.headers.get("Content-Length") or 0)).decode())
+        grant_type = form.get("grant_type", [""])[0]
+
+        with self._lock:
+            self.requests["token"] += 1
+
+        expected = "Basic " + base64.b64encode("{}:{}".format(self.client_id, self.client_secret).encode()).decode()
+        if urlparse(handler.path).path != "/api/token" or handler.headers.get("Authorization") != expected:
+            self._send(handler, 401, {"error": "invalid_client"})
+            return
+        if grant_type not in ("client_credentials", "refresh_token"):
+            self._send(handler, 400, {"error": "unsupported_grant_type"})
+            return
+
+        with self._lock:
+            self._tokens_issued += 1
+            self.token = "token-{}".format(self._tokens_issued)
+            token = self.token
+
+        self._send(handler, 200, {"access_token": token, "token_type": "Bearer", "expires_in": 3600})
+
+    def _handle_get(self, handler: BaseHTTPRequestHandler):
+        url = urlparse(handler.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 20))
+
+        with self._lock:
+            authorized = self.token is not None and handler.headers.get("Authorization") == "Bearer " + self.token
+        if not authorized:
+            self._send(handler, 401, {"error": {"status": 401, "message": "The access token expired"}})
+            return
+
+        playlist = _PLAYLIST_PATH.match(url.path)
+        if playlist:
+            with self._lock:
+                found = self.playlists.get(playlist.group("id"))
+                version = self._versions[playlist.group("id")]
+            if found is None:
+                self._send(handler, 404, {"error": {"status": 404, "message": "Not found."}})
+                return
+
+            if not playlist.group("tracks"):
+                with self._lock:
+                    self.requests["playlist"] += 1
+                self._send(handler, 200, {
+                    "name": found["name"],
+                    "snapshot_id": "snapshot-{}".format(version),
+                    "tracks": {"total": len(found["tracks"])},
+                })
+                return
+
+            with self._lock:
+                self.requests["playlist_tracks"] += 1
+                self.offsets.append(offset)
+            self._send(handler, 200, self._page(found["tracks"], offset, limit))
+        elif url.path == "/v1/me/tracks":
+            with self._lock:
+                etag = '"saved-tracks-{}"'.format(self._versions["saved-tracks"])
+                tracks = self.saved_tracks
+
+            if handler.headers.get("If-None-Match") == etag:
+                with self._lock:
+                    self.requests["saved_tracks_not_modified"] += 1
+                self._send(handler, 304, None)
+                return
+
+            with self._lock:
+                self.requests["saved_tracks"] += 1
+                self.offsets.append(offset)
+            self._send(handler, 200, self._page(tracks, offset, limit), {"ETag": etag})
+        else:
+            self._send(handler, 404, {"error": {"status": 404, "message": "Service not found"}})
+
+    @staticmethod
+    def _page(tracks: "list[dict]", offset: int, limit: int) -> dict:
+        return {
+            "items": [{"track": track} for track in tracks[offset:offset + limit]],
+            "offset": offset,
+            "limit": limit,
+            "total": len(tracks),
+        }
+
+    @staticmethod
+    def _send(handler: BaseHTTPRequestHandler, status: int, body, headers: Optional[dict] = None):
+        data = json.dumps(body).encode() if body is not None else b""
+        handler.send_response(status)
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        if body is not None:
+            handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+__all__ = ["FakeSpotify", "fake_track"]
@@ -0,0 +1,84 @@
+import argparse
+import csv
+import random
+from os import PathLike
+
+# Column names of an Exportify CSV playlist
+FIELDS = [
+    "Track URI", "Track Name", "Artist URI(s)", "Artist Name(s)", "Album URI", "Album Name", "Album Artist URI(s)",
+    "Album Artist Name(s)", "Album Release Date", "Album Image URL", "Disc Number", "Track Number",
+    "Track Duration (ms)", "Track Preview URL", "Explicit", "Popularity", "Added By", "Added At",
+]
+
+SIZES = (1000, 10000, 100000)
+
+
+def generate_playlist(path: "PathLike | str", rows: int, tracks_per_album: int = 10, duplicate_rate: float = 0.1,
+                      seed: int = 0):
+    """
+    Writes a synthetic Exportify CSV playlist.
+    :param path: The path of the CSV file to write.
+    :param rows: The number of tracks in the playlist.
+    :param tracks_per_album: Optional. The average number of tracks from each album.
+    :param duplicate_rate: Optional. The fraction of rows which repeat an earlier track, like a track that's in
+                           several playlists.
+    :param seed: Optional. The random seed, so the same arguments always generate the same playlist.
+    """
+    rng = random.Random(seed)
+    album_count = max(1, rows // tracks_per_album)
+    artist_count = max(1, album_count // 3)
+    written = []
+
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+
+        for number in range(rows):
+            if written and rng.random() < duplicate_rate:
+                writer.writerow(rng.choice(written))
+                continue
+
+            album = rng.randrange(album_count)
+            artist = album % artist_count
+            track = number
+            row = {
+                "Track URI": "spotify:track:{:022d}".format(track),
+                "Track Name": "Track {}".format(track),
+                "Artist URI(s)": "spotify:artist:{:022d}".format(artist),
+                "Artist Name(s)": "Artist {}".format(artist),
+                "Album URI": "spotify:album:{:022d}".format(album),
+                "Album Name": "Album {}".format(album),
+                "Album Artist URI(s)": "spotify:artist:{:022d}".format(artist),
+                "Album Artist Name(s)": "Artist {}".format(artist),
+                "Album Release Date": "{}-01-01".format(1960 + album % 60),
+                "Album Image URL": "",
+                "Disc Number": 1,
+                "Track Number": rng.randint(1, tracks_per_album),
+                "Track Duration (ms)": rng.randint(120000, 400000),
+                "Track Preview URL": "",
+                "Explicit": "false",
+                "Popularity": rng.randint(0, 100),
+                "Added By": "spotify:user:benchmark",
+                "Added At": "2020-01-01T00:00:00Z",
+            }
+            writer.writerow(row)
+
+            if len(written) < 10000:
+                written.append(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a synthetic Exportify CSV playlist for benchmarking")
+    parser.add_argument("--rows", "-n", type=int, default=SIZES[0], help="The number of tracks. Default %(default)d")
+    parser.add_argument(
+        "--tracks-per-album", type=int, default=10, help="The average number of tracks per album. Default %(default)d"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="The random seed. Default %(default)d")
+    parser.add_argument("path", help="The path of the CSV file to write")
+    params = parser.parse_args()
+
+    generate_playlist(params.path, params.rows, tracks_per_album=params.tracks_per_album, seed=params.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from headphones_spotify_import import Importer
+from headphones_spotify_import.log import configure_logging
+
+from .fake_headphones import FakeHeadphones
+from .generate import SIZES, generate_playlist
+
+
+def measure(fn, memory: bool = True) -> dict:
+    """
+    Measures the wall time of calling `fn`, and then the peak memory of calling it again, with its output hidden.
+    Memory is measured separately since tracing allocations slows everything down.
+    :param fn: The function to measure.
+    :param memory: Optional. If `False`, memory is not measured.
+    :return: A dict of the `result` of the first call, its `seconds`, and the `peak_bytes` of the second call.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+
+        peak_bytes = None
+        if memory:
+            tracemalloc.start()
+            try:
+                fn()
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+    return dict(result=result, seconds=seconds, peak_bytes=peak_bytes)
+
+
+def _megabytes(value) -> float:
+    return value / 1024 / 1024 if value is not None else float("nan")
+
+
+def benchmark(rows: int, directory: str, workers: int, latency: float, error_rate: float, result_count: int,
+              compact: bool, memory: bool = True) -> dict:
+    """
+    Benchmarks loading and importing a synthetic playlist with `rows` tracks against a fake headphones server.
+    :return: A dict of the measurements.
+    """
+    path = os.path.join(directory, "playlist-{}.csv".format(rows))
+    if not os.path.exists(path):
+        generate_playlist(path, rows)
+
+    with FakeHeadphones(latency=latency, error_rate=error_rate, result_count=result_count) as server:
+        def make_importer():
+            return Importer(
+                server.url, "benchmark", prompt=False, prompt_albums=False, workers=workers, add_workers=workers,
+                keep_tracks=not compact,
+            )
+
+        load = measure(lambda: make_importer().load_playlist_albums(path), memory)
+        imported = measure(lambda: make_importer().import_playlist([path]), memory)
+        summary = imported["result"]
+
+        # Only count the requests of the timed run
+        requests = {cmd: count // (2 if memory else 1) for cmd, count in server.requests.items()}
+
+    return dict(
+        rows=rows,
+        albums=len(load["result"]),
+        load_seconds=load["seconds"],
+        load_peak_mb=_megabytes(load["peak_bytes"]),
+        import_seconds=imported["seconds"],
+        import_peak_mb=_megabytes(imported["peak_bytes"]),
+        albums_per_second=summary["total"] / imported["seconds"],
+        added=summary["added"],
+        requests=requests,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the importer against a local fake headphones server with synthetic playlists"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=list(SIZES),
+        help="The numbers of playlist rows to benchmark. Default %(default)s"
+    )
+    parser.add_argument("--workers", "-w", type=int, default=8, help="Importer workers per stage. Default %(default)d")
+    parser.add_argument(
+        "--latency", type=float, default=0.01, help="Seconds each fake request takes. Default %(default)g"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of fake requests which fail. Default %(default)g"
+    )
+    parser.add_argument(
+        "--results", type=int, default=5, help="Number of results returned by findAlbum. Default %(default)d"
+    )
+    parser.add_argument("--compact", action="store_true", default=False, help="Only keep track counts in memory.")
+    parser.add_argument(
+        "--no-memory", action="store_true", default=False,
+        help="Don't measure peak memory, which needs every benchmark to run twice."
+    )
+    parser.add_argument(
+        "--data-dir", type=str, default=None,
+        help="Where to keep the generated playlists, so they can be reused. Defaults to a temporary directory"
+    )
+    params = parser.parse_args()
+
+    # The importer's messages would only slow it down
+    configure_logging(logging.ERROR, buffered=False)
+
+    header = "{:>8} {:>7} {:>9} {:>9} {:>10} {:>10} {:>10} {:>8}".format(
+        "rows", "albums", "load s", "load MB", "import s", "import MB", "albums/s", "added"
+    )
+    print(header)
+    print("-" * len(header))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = params.data_dir or tmp
+        os.makedirs(directory, exist_ok=True)
+
+        for rows in params.sizes:
+            result = benchmark(
+                rows, directory, params.workers, params.latency, params.error_rate, params.results, params.compact,
+                memory=not params.no_memory,
+            )
+            print(
+                "{rows:>8} {albums:>7} {load_seconds:>9.2f} {load_peak_mb:>9.1f} {import_seconds:>10.2f} "
+                "{import_peak_mb:>10.1f} {albums_per_second:>10.1f} {added:>8}".format_map(result)
+            )
+            print("{:>8} requests: {}".format("", ", ".join(
+                "{}={}".format(cmd, count) for cmd, count in sorted(result["requests"].items())
+            )))
+
+
+if __name__ == "__main__":
+    main()
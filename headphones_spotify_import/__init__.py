@@ -1,3 +1,7 @@
-from .importer import Importer
+from .api import AlbumResult, AsyncImportService, ImportResult, ImportService
+from .importer import ImportAborted, Importer
+from .targets import ImportTarget
 
-__all__ = ["Importer"]
+__all__ = [
+    "AlbumResult", "AsyncImportService", "ImportAborted", "ImportResult", "ImportService", "ImportTarget", "Importer"
+]
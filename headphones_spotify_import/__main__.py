@@ -1,23 +1,191 @@
+import logging
 import sys
-import traceback
+from typing import Optional
 
 from .args import parser
-from .importer import Importer
+from .cache import AlbumCache
+from .client import SEARCH_COMMANDS, WRITE_COMMANDS, HeadphonesClient, command_limiters
+from .importer import ImportAborted, Importer
+from .log import LEVELS, Progress, configure_logging, get_logger
+from .metrics import Metrics
+from .plan import ImportPlan
+from .scheduler import QueueScheduler
+from .sources import SourceCache, SpotifyClient, SpotifySource
+from .state import ImportState
+from .targets import ImportTarget
+
+
+def spotify_source(params) -> Optional[SpotifySource]:
+    if not (params.spotify_playlist or params.spotify_saved_tracks):
+        return None
+
+    return SpotifySource(
+        SpotifyClient(
+            token=params.spotify_token,
+            client_id=params.spotify_client_id,
+            client_secret=params.spotify_client_secret,
+            refresh_token=params.spotify_refresh_token,
+            api_url=params.spotify_api_url,
+            accounts_url=params.spotify_accounts_url,
+            workers=params.spotify_workers,
+            retries=params.retries,
+            backoff=params.retry_backoff,
+        ),
+        playlists=params.spotify_playlist,
+        saved_tracks=params.spotify_saved_tracks,
+        cache=None if params.no_spotify_cache else SourceCache(params.spotify_cache),
+    )
+
+
+def import_targets(params, metrics: Optional[Metrics]) -> "list[ImportTarget]":
+    targets = []
+    for target in params.target:
+        client = HeadphonesClient(
+            target["url"],
+            target["apikey"],
+            connect_timeout=params.connect_timeout,
+            read_timeout=params.timeout,
+            retries=params.retries,
+            backoff=params.retry_backoff,
+            pool_size=max(1, params.add_workers),
+            rate_limit=params.rate_limit,
+            metrics=metrics,
+            # Only adding and queueing is done on other servers, each at its own pace
+            limiters=command_limiters(
+                write_rate=params.write_rate, adaptive=params.adaptive_rate, write_workers=max(1, params.add_workers)
+            ),
+        )
+        targets.append(ImportTarget(target["name"], client, queue=target["queue"], lossless=target["lossless"]))
+
+    return targets
 
 
 def main():
     try:
         params = parser.parse_args()
 
-        importer = Importer(params.url, params.api_key, prompt=not params.yes, color=(params.color == "yes"), prompt_albums=not (params.yes or params.yes_albums))
+        level = params.log_level or ("warning" if params.progress else "info")
+        configure_logging(
+            LEVELS[level],
+            fmt=params.log_format,
+            color=(params.color == "yes"),
+            # Prompts have to appear after the messages before them
+            buffered=params.yes,
+        )
+        progress = Progress() if params.progress else None
+
+        cache = None
+        if not params.no_cache:
+            cache = AlbumCache(params.cache, negative_ttl=params.cache_ttl * 24 * 60 * 60)
+            if params.prune_cache:
+                get_logger().info("Pruned {} expired entries from the album ID cache".format(cache.prune()))
+
+        state = ImportState(params.state) if params.state else None
+
+        if params.drain_queue and not params.queue_file:
+            parser.error("--drain-queue needs --queue-file")
+        if params.plan and params.apply:
+            parser.error("--plan and --apply can't be used together")
 
-        importer.import_playlist(params.files, queue=params.queue, lossless=params.lossless, min_tracks=params.min_tracks)
+        queue_scheduler = None
+        if params.queue_file:
+            queue_scheduler = QueueScheduler(
+                params.queue_file,
+                rate=params.queue_rate,
+                batch_size=params.queue_batch,
+                batch_interval=params.queue_batch_interval,
+                window=params.queue_window,
+            )
+
+        metrics = Metrics(slowest=params.slowest) if params.report or params.metrics else None
+
+        limiters = command_limiters(
+            search_rate=params.search_rate,
+            write_rate=params.write_rate,
+            adaptive=params.adaptive_rate,
+            search_workers=max(1, params.workers),
+            write_workers=max(1, params.add_workers) + max(1, params.queue_workers),
+        )
+        if progress is not None and params.adaptive_rate:
+            progress.gauges["search"] = limiters[SEARCH_COMMANDS[0]]
+            progress.gauges["write"] = limiters[WRITE_COMMANDS[0]]
+
+        client = HeadphonesClient(
+            params.url,
+            params.api_key,
+            connect_timeout=params.connect_timeout,
+            read_timeout=params.timeout,
+            retries=params.retries,
+            backoff=params.retry_backoff,
+            pool_size=max(1, params.workers) + max(1, params.add_workers) + max(1, params.queue_workers),
+            rate_limit=params.rate_limit,
+            metrics=metrics,
+            limiters=limiters,
+        )
+
+        importer = Importer(
+            params.url,
+            params.api_key,
+            prompt=not params.yes,
+            color=(params.color == "yes"),
+            prompt_albums=not (params.yes or params.yes_albums),
+            workers=params.workers,
+            cache=cache,
+            refresh_cache=params.refresh_cache,
+            state=state,
+            skip_existing=params.skip_existing,
+            client=client,
+            keep_tracks=not params.compact,
+            add_workers=params.add_workers,
+            queue_workers=params.queue_workers,
+            match_threshold=params.match_threshold,
+            fallback=not params.no_fallback,
+            metrics=metrics,
+            queue_scheduler=queue_scheduler,
+            progress=progress,
+            merge_editions=not params.keep_editions,
+            load_workers=params.load_workers,
+            targets=import_targets(params, metrics),
+        )
+
+        if params.drain_queue:
+            importer.drain_queue()
+            return 0
+
+        if params.apply:
+            plan = ImportPlan(params.apply)
+            try:
+                importer.apply_plan(plan)
+            finally:
+                plan.close()
+        else:
+            source = spotify_source(params)
+            try:
+                importer.import_playlist(
+                    params.files,
+                    queue=params.queue,
+                    lossless=params.lossless,
+                    min_tracks=params.min_tracks,
+                    rows=source,
+                    plan=params.plan,
+                )
+            finally:
+                if source is not None:
+                    source.client.close()
+
+        if params.report:
+            metrics.write_report(params.report)
+        if params.metrics:
+            metrics.write_prometheus(params.metrics)
 
         return 0
+    except ImportAborted:
+        return 1
     except Exception as e:
-        print("Fatal error: {}".format(e.args))
-        traceback.print_exc()
+        get_logger().exception("Fatal error: {}".format(e.args))
         return 1
+    finally:
+        logging.shutdown()
 
 
 if __name__ == "__main__":
@@ -2,32 +2,70 @@ from datetime import date
 
 
 class Track:
-    def __init__(self, name, artist):
+    __slots__ = ("name", "artist", "uri")
+
+    def __init__(self, name, artist, uri=None):
         self.name = name
         self.artist = artist
+        self.uri = uri
 
     def __str__(self):
         return "{artist} - {name}".format(name=self.name, artist=self.artist)
 
 
 class Album:
-    def __init__(self, name, artists, release_date):
+    __slots__ = (
+        "name", "artists", "release_date", "uri", "release_year", "tracks", "track_count", "track_artists",
+        "_track_uris", "status", "musicbrainz_id", "edition_uris",
+    )
+
+    def __init__(self, name, artists, release_date, uri=None, keep_tracks=True):
         self.name = name
         self.artists = artists
         self.release_date = release_date
+        self.uri = uri
 
         try:
             self.release_year = date.fromisoformat(release_date).year
         except ValueError:
             self.release_year = release_date[:4]
 
-        self.tracks = []
+        # Without `keep_tracks`, only the number of tracks and their artists are kept, to save memory
+        self.tracks = [] if keep_tracks else None
+        self.track_count = 0
+        self.track_artists = set()
+        self._track_uris = set()
 
         self.status = None
         self.musicbrainz_id = None
 
-    def add_track(self, track: Track):
-        self.tracks.append(track)
+        # The URIs of other editions of the album which were merged into it
+        self.edition_uris = ()
+
+    @property
+    def uris(self) -> tuple:
+        """
+        The URIs of the album and of every edition merged into it.
+        """
+        return ((self.uri,) if self.uri else ()) + self.edition_uris
+
+    def add_track(self, track: Track) -> bool:
+        """
+        Adds a track to the album, unless a track with the same URI was already added.
+        :param track: The track.
+        :return: `True` if the track was added.
+        """
+        if track.uri:
+            if track.uri in self._track_uris:
+                return False
+            self._track_uris.add(track.uri)
+
+        self.track_count += 1
+        self.track_artists.add(track.artist)
+        if self.tracks is not None:
+            self.tracks.append(track)
+
+        return True
 
     def __str__(self):
-        return "{artists} - {name} ({year})".format(artists=self.artists, name=self.name, year=self.release_year)
\ No newline at end of file
+        return "{artists} - {name} ({year})".format(artists=self.artists, name=self.name, year=self.release_year)
@@ -0,0 +1,193 @@
+import asyncio
+import functools
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from typing import Callable, Iterable, Optional
+
+from .album import Album
+from .cache import AlbumCache
+from .client import HeadphonesClient
+from .importer import Importer
+from .log import get_logger
+from .state import ImportState
+
+# `status` is the album's status on the main server, and `targets` its status on each of the `targets` servers of
+# the import it was sent to, by name
+AlbumResult = namedtuple("AlbumResult", ["uri", "name", "artists", "release_date", "track_count", "status",
+                                         "musicbrainz_id", "targets"])
+ImportResult = namedtuple("ImportResult", ["summary", "albums"])
+
+
+def album_result(album: Album, targets: Optional[dict] = None) -> AlbumResult:
+    return AlbumResult(
+        album.uri,
+        album.name,
+        album.artists,
+        album.release_date,
+        album.track_count,
+        album.status,
+        album.musicbrainz_id,
+        targets or {},
+    )
+
+
+class _CallbackProgress:
+    def __init__(self, callback: Callable[[AlbumResult], None]):
+        """
+        Passes each album status update of an import on to `callback`, in place of a progress line.
+        """
+        self.callback = callback
+        self.total = None
+
+    def set_total(self, total: Optional[int]):
+        self.total = total
+
+    def update(self, album: Album, status: str):
+        self.callback(album_result(album))
+
+    def finish(self):
+        pass
+
+
+class ImportService:
+    def __init__(self, url: str, apikey: str, cache: Optional[AlbumCache] = None, state: Optional[ImportState] = None,
+                 client: Optional[HeadphonesClient] = None, rate_limit: Optional[float] = None, **options):
+        """
+        Imports playlists into one headphones server without any prompts, for use from other programs. The
+        connections to the server and the album ID cache are kept between imports, so it's meant to be created once
+        and used for many imports. Imports may run at the same time from different threads.
+        Nothing is logged unless logging has been configured, e.g. with `log.configure_logging`.
+        :param url: The base URL of headphones, e.g. http://headphones:8181
+        :param apikey: The headphones API key.
+        :param cache: Optional. A cache of previously resolved album IDs, shared by all imports.
+        :param state: Optional. The import state shared by all imports, to skip albums imported before.
+        :param client: Optional. The client to communicate with headphones through. If not given, one is created with
+                       `url`, `apikey` and `rate_limit`.
+        :param rate_limit: Optional. The maximum number of API requests per second to make to the server, across all
+                           imports.
+        :param options: Any other options of `Importer`, e.g. `workers` or `skip_existing`, used for every import.
+                        With `load_workers` above `1`, the script using the service has to create it under an
+                        `if __name__ == "__main__":` guard, as the processes parsing the files are spawned.
+        """
+        logger = get_logger()
+        if not logger.handlers:
+            # Stop the importer from setting up console output of its own
+            logger.addHandler(logging.NullHandler())
+
+        if client is None:
+            pool_size = sum(max(1, options.get(name, 1)) for name in ("workers", "add_workers", "queue_workers"))
+            client = HeadphonesClient(url, apikey, pool_size=pool_size, rate_limit=rate_limit)
+
+        self.client = client
+        self.cache = cache
+        self.state = state
+        self.options = options
+
+    def import_files(self, files: "Iterable[PathLike | str]", queue: bool = False, lossless: bool = True,
+                     min_tracks: int = 1, progress: Optional[Callable[[AlbumResult], None]] = None) -> ImportResult:
+        """
+        Imports and optionally queues the albums in CSV playlist files.
+        :param files: The paths of the CSV playlist files.
+        :param queue: If `True`, albums will be queued after they are imported.
+        :param lossless: If `True`, only lossless albums will be added when queued. Defaults to `True`.
+        :param min_tracks: The number of different tracks from an album which must be included for it to be added.
+        :param progress: Optional. Called from the import's threads with the result so far of an album, every time its
+                         status on the main server changes. Its `targets` are left empty until the final results.
+        :return: A summary of the actions taken, and the final result of each album.
+        """
+        files = list(files)
+        if not files:
+            raise ValueError("No playlist files given")
+
+        return self._import(files, None, queue, lossless, min_tracks, progress)
+
+    def import_rows(self, rows: "Iterable[dict]", queue: bool = False, lossless: bool = True, min_tracks: int = 1,
+                    progress: Optional[Callable[[AlbumResult], None]] = None) -> ImportResult:
+        """
+        Imports and optionally queues the albums in playlist rows, which have the columns of an Exportify CSV playlist.
+        Only "Track URI", "Track Name", "Artist Name(s)", "Album URI", "Album Name", "Album Artist Name(s)" and
+        "Album Release Date" are needed. See `import_files` for the other parameters.
+        :param rows: An iterable of dicts, one per track. It's read as the import goes on.
+        """
+        return self._import([], rows, queue, lossless, min_tracks, progress)
+
+    def _import(self, files, rows, queue, lossless, min_tracks, progress) -> ImportResult:
+        importer = Importer(
+            self.client.url,
+            self.client.apikey,
+            prompt=False,
+            prompt_albums=False,
+            cache=self.cache,
+            state=self.state,
+            client=self.client,
+            progress=_CallbackProgress(progress) if progress is not None else None,
+            **self.options
+        )
+        summary = importer.import_playlist(files, queue=queue, lossless=lossless, min_tracks=min_tracks, rows=rows)
+        return ImportResult(
+            summary, [album_result(album, importer.target_statuses(album)) for album in importer.albums]
+        )
+
+    def close(self):
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncImportService:
+    def __init__(self, *args, max_imports: int = 4, **kwargs):
+        """
+        An asyncio version of `ImportService`. Each import runs in a thread of its own, so up to `max_imports` imports
+        can run at once without blocking the event loop. Takes the same arguments as `ImportService`.
+        :param max_imports: Optional. The number of imports which can run at once. Later imports wait for a free one.
+        """
+        self.service = ImportService(*args, **kwargs)
+        self._executor = ThreadPoolExecutor(max_imports)
+
+    async def import_files(self, files: "Iterable[PathLike | str]", queue: bool = False, lossless: bool = True,
+                           min_tracks: int = 1,
+                           progress: Optional[Callable[[AlbumResult], None]] = None) -> ImportResult:
+        """
+        See `ImportService.import_files`. `progress` is called from the event loop.
+        """
+        return await self._run(self.service.import_files, files, queue, lossless, min_tracks, progress)
+
+    async def import_rows(self, rows: "Iterable[dict]", queue: bool = False, lossless: bool = True,
+                          min_tracks: int = 1, progress: Optional[Callable[[AlbumResult], None]] = None) -> ImportResult:
+        """
+        See `ImportService.import_rows`. `progress` is called from the event loop. `rows` is read from another thread,
+        so it should not be tied to the event loop.
+        """
+        return await self._run(self.service.import_rows, rows, queue, lossless, min_tracks, progress)
+
+    async def _run(self, method, source, queue, lossless, min_tracks, progress) -> ImportResult:
+        loop = asyncio.get_event_loop()
+
+        if progress is not None:
+            callback = progress
+
+            def progress(result):
+                loop.call_soon_threadsafe(callback, result)
+
+        return await loop.run_in_executor(self._executor, functools.partial(
+            method, source, queue=queue, lossless=lossless, min_tracks=min_tracks, progress=progress
+        ))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.service.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_event_loop().run_in_executor(None, self.close)
+
+
+__all__ = ["AlbumResult", "AsyncImportService", "ImportResult", "ImportService", "album_result"]
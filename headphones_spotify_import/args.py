@@ -1,4 +1,43 @@
 import argparse
+import os
+
+from .cache import DEFAULT_NEGATIVE_TTL, default_cache_path
+from .matching import DEFAULT_THRESHOLD
+from .sources import SPOTIFY_ACCOUNTS_URL, SPOTIFY_API_URL, default_source_cache_path
+
+# The options of a --target, and the setting each one gives it
+TARGET_OPTIONS = {
+    "queue": ("queue", True),
+    "no-queue": ("queue", False),
+    "lossless": ("lossless", True),
+    "lossy": ("lossless", False),
+}
+
+
+def parse_target(value: str) -> dict:
+    """
+    Parses a --target: `URL,API_KEY`, then any of `name=NAME`, `queue`, `no-queue`, `lossless` and `lossy`, separated
+    by commas.
+    """
+    parts = [part.strip() for part in value.split(",")]
+    if len(parts) < 2 or not parts[0] or not parts[1]:
+        raise argparse.ArgumentTypeError("expected URL,API_KEY[,OPTION...], got '{}'".format(value))
+
+    url, apikey = parts[:2]
+    if not url.startswith("http"):
+        url = "http://" + url
+
+    target = dict(url=url, apikey=apikey, name=url.split("://", 1)[1].rstrip("/"), queue=None, lossless=None)
+    for option in parts[2:]:
+        if option.startswith("name="):
+            target["name"] = option[len("name="):]
+        elif option in TARGET_OPTIONS:
+            key, setting = TARGET_OPTIONS[option]
+            target[key] = setting
+        else:
+            raise argparse.ArgumentTypeError("unknown target option '{}'".format(option))
+
+    return target
 
 parser = argparse.ArgumentParser(
     description="Collects albums from spotify playlists and imports them to a headphones server",
@@ -16,7 +55,51 @@ parser.add_argument(
     type=str,
     help="The headphones API key. If not set, it will be prompted for unless `-y` is selected."
 )
+parser.add_argument(
+    "--target",
+    type=parse_target,
+    action="append",
+    default=[],
+    metavar="URL,API_KEY[,OPTION...]",
+    help="Another headphones server to add every album to. Albums are only searched for on the --url server, then "
+         "added to every server at the same time. Options: name=NAME for messages, and queue, no-queue, lossless or "
+         "lossy to override --queue and --lossless for this server. Can be given more than once."
+)
 parser.add_argument("--color", default="yes", choices=["yes", "no"], help="Whether to color the output. Default 'yes'")
+parser.add_argument(
+    "--log-level",
+    default=None,
+    choices=["debug", "info", "success", "warning", "error"],
+    help="The minimum level of messages to output. Default 'info', or 'warning' with --progress"
+)
+parser.add_argument(
+    "--verbose", "-v",
+    action="store_const",
+    const="debug",
+    dest="log_level",
+    help="Output everything, including the tracks of each album and the scores of search results. "
+         "Same as --log-level debug"
+)
+parser.add_argument(
+    "--quiet",
+    action="store_const",
+    const="warning",
+    dest="log_level",
+    help="Only output warnings and errors. Same as --log-level warning"
+)
+parser.add_argument(
+    "--log-format",
+    default="text",
+    choices=["text", "json"],
+    help="Output messages as plain text lines, or as one JSON object per line. Default 'text'"
+)
+parser.add_argument(
+    "--progress", "-p",
+    action="store_true",
+    default=False,
+    help="Show a progress line with the number of albums processed on stderr, and only output warnings and errors "
+         "unless --log-level is given."
+)
 parser.add_argument("--yes", "-y", action="store_true", default=False, help="Skip all prompts and import everything.")
 parser.add_argument(
     "--yes-albums", "-a",
@@ -26,10 +109,301 @@ parser.add_argument(
 )
 parser.add_argument("--queue", "-q", action="store_true", default=False, help="Queue all albums after adding them.")
 parser.add_argument("--lossless", "-l", action="store_true", default=False, help="When queueing, only search lossless.")
+parser.add_argument(
+    "--queue-file",
+    type=str,
+    default=None,
+    help="Instead of queueing albums as soon as they're added, save them to this file and queue them gradually, "
+         "according to --queue-rate, --queue-batch and --queue-window. Albums not queued by the end of the import "
+         "stay in the file for --drain-queue."
+)
+parser.add_argument(
+    "--queue-rate",
+    type=float,
+    default=None,
+    help="With --queue-file, the maximum number of albums to queue per minute. Default unlimited"
+)
+parser.add_argument(
+    "--queue-batch",
+    type=int,
+    default=1,
+    help="With --queue-file, how many albums to queue at a time. Default %(default)d"
+)
+parser.add_argument(
+    "--queue-batch-interval",
+    type=float,
+    default=0,
+    help="With --queue-file, how many seconds to wait between batches. Default %(default)g"
+)
+parser.add_argument(
+    "--queue-window",
+    type=str,
+    default=None,
+    help="With --queue-file, only queue albums during this daily time window, e.g. 01:00-06:00"
+)
+parser.add_argument(
+    "--drain-queue",
+    action="store_true",
+    default=False,
+    help="Don't import any playlists, just queue the albums left in --queue-file by previous imports."
+)
+parser.add_argument(
+    "--plan",
+    type=str,
+    default=None,
+    metavar="PLAN",
+    help="Only search for the albums, and write what would be added and queued to this plan file instead of doing it. "
+         "The plan can be reviewed, and carried out later with --apply."
+)
+parser.add_argument(
+    "--apply",
+    type=str,
+    default=None,
+    metavar="PLAN",
+    help="Don't import any playlists, just add and queue the albums in a plan file written by --plan. Albums done by "
+         "a previous --apply of the same plan are skipped."
+)
 parser.add_argument(
     "--min-tracks", "-m",
     type=int,
     default=1,
-    help="If specified, albums will only be added when at least this many of their songs are included in playlists"
+    help="If specified, albums will only be added when at least this many of their songs are included in playlists. "
+         "Songs included in more than one playlist are only counted once."
+)
+parser.add_argument(
+    "--match-threshold",
+    type=float,
+    default=DEFAULT_THRESHOLD,
+    help="The minimum score, from 0 to 1, for a search result to be accepted as the album. Lower it to accept looser "
+         "matches. Default %(default)g"
+)
+parser.add_argument(
+    "--no-fallback",
+    action="store_true",
+    default=False,
+    help="Don't search again with more relaxed queries for albums which could not be found."
+)
+parser.add_argument(
+    "--keep-editions",
+    action="store_true",
+    default=False,
+    help="Search for each edition of an album separately, e.g. its explicit and clean versions or a deluxe edition, "
+         "instead of merging them into one album first."
+)
+parser.add_argument(
+    "--workers", "-w",
+    type=int,
+    default=1,
+    help="The number of album searches to run at the same time. Default 1"
+)
+parser.add_argument(
+    "--load-workers",
+    type=int,
+    default=1,
+    help="The number of processes to parse playlist files with at the same time. Speeds up loading many playlist "
+         "files on a machine with several cores. Default 1"
+)
+parser.add_argument(
+    "--add-workers",
+    type=int,
+    default=1,
+    help="The number of albums to add to headphones at the same time. Default 1"
+)
+parser.add_argument(
+    "--queue-workers",
+    type=int,
+    default=1,
+    help="The number of albums to queue at the same time. Default 1"
+)
+parser.add_argument(
+    "--rate-limit", "-r",
+    type=float,
+    default=None,
+    help="The maximum number of API requests per second to send to headphones. Default unlimited"
+)
+parser.add_argument(
+    "--search-rate",
+    type=float,
+    default=None,
+    help="The maximum number of album searches per second. Searches are passed on to musicbrainz, which may limit "
+         "them much more than headphones does. Default unlimited"
+)
+parser.add_argument(
+    "--write-rate",
+    type=float,
+    default=None,
+    help="The maximum number of albums to add or queue per second. Default unlimited"
+)
+parser.add_argument(
+    "--adaptive-rate",
+    action="store_true",
+    default=False,
+    help="Start searching, adding and queueing slowly, and speed up while headphones keeps up. Slow down as soon as "
+         "requests time out, fail with 429 or 503 errors, or take much longer than usual. --search-rate and "
+         "--write-rate become the maximum rates. The current rates are shown with --progress."
+)
+parser.add_argument(
+    "--connect-timeout",
+    type=float,
+    default=10,
+    help="How many seconds to wait for a connection to headphones. Default %(default)g"
+)
+parser.add_argument(
+    "--timeout", "-t",
+    type=float,
+    default=120,
+    help="How many seconds to wait for headphones to respond to a request. Default %(default)g"
+)
+parser.add_argument(
+    "--retries",
+    type=int,
+    default=3,
+    help="How many times to retry requests that fail with a connection error or a server error. Default %(default)d"
+)
+parser.add_argument(
+    "--retry-backoff",
+    type=float,
+    default=1.0,
+    help="How many seconds to wait before the first retry. The wait doubles after each retry. Default %(default)g"
+)
+parser.add_argument(
+    "--cache",
+    type=str,
+    default=default_cache_path(),
+    help="Path of the album ID cache, which remembers the albums found by previous runs. Default '%(default)s'"
+)
+parser.add_argument("--no-cache", action="store_true", default=False, help="Don't read or write the album ID cache.")
+parser.add_argument(
+    "--refresh-cache",
+    action="store_true",
+    default=False,
+    help="Search for every album again and replace the cached results."
+)
+parser.add_argument(
+    "--prune-cache",
+    action="store_true",
+    default=False,
+    help="Remove expired 'not found' results from the cache before importing."
+)
+parser.add_argument(
+    "--cache-ttl",
+    type=float,
+    default=DEFAULT_NEGATIVE_TTL / (24 * 60 * 60),
+    help="How many days to remember albums that could not be found before searching for them again. Default %(default)g"
+)
+parser.add_argument(
+    "--compact", "-c",
+    action="store_true",
+    default=False,
+    help="Only keep the number of tracks of each album in memory instead of listing every track. "
+         "Useful for very large playlists."
+)
+parser.add_argument(
+    "--state", "-s",
+    type=str,
+    default=None,
+    help="Path of a state file recording the outcome of each album. If given, albums imported by previous runs with "
+         "the same state file are skipped, and an interrupted run picks up where it stopped."
+)
+parser.add_argument(
+    "--skip-existing", "-e",
+    action="store_true",
+    default=False,
+    help="Fetch the albums headphones already has before importing, and don't add or queue them again."
+)
+parser.add_argument(
+    "--report",
+    type=str,
+    default=None,
+    help="Write a report of how long each phase, stage and API command took, and the slowest albums, to this path. "
+         "Paths ending in .csv get a CSV report, others get JSON."
+)
+parser.add_argument(
+    "--metrics",
+    type=str,
+    default=None,
+    help="Write the same measurements as --report to this path in the Prometheus text format."
+)
+parser.add_argument(
+    "--slowest",
+    type=int,
+    default=10,
+    help="The number of slowest albums to include in --report. Default %(default)d"
+)
+parser.add_argument(
+    "--spotify-playlist",
+    action="append",
+    default=[],
+    metavar="PLAYLIST",
+    help="Read a playlist directly from spotify, by its ID, URI or link, instead of from a CSV file. "
+         "Can be given more than once."
+)
+parser.add_argument(
+    "--spotify-saved-tracks",
+    action="store_true",
+    default=False,
+    help="Read your saved tracks directly from spotify. Needs --spotify-token, or --spotify-refresh-token."
+)
+parser.add_argument(
+    "--spotify-token",
+    type=str,
+    default=os.environ.get("SPOTIFY_TOKEN"),
+    help="A spotify access token to read playlists with. Defaults to the SPOTIFY_TOKEN environment variable"
+)
+parser.add_argument(
+    "--spotify-client-id",
+    type=str,
+    default=os.environ.get("SPOTIFY_CLIENT_ID"),
+    help="The client ID of your spotify application, to get access tokens with instead of --spotify-token. "
+         "Defaults to the SPOTIFY_CLIENT_ID environment variable"
+)
+parser.add_argument(
+    "--spotify-client-secret",
+    type=str,
+    default=os.environ.get("SPOTIFY_CLIENT_SECRET"),
+    help="The client secret of your spotify application. Defaults to the SPOTIFY_CLIENT_SECRET environment variable"
+)
+parser.add_argument(
+    "--spotify-refresh-token",
+    type=str,
+    default=os.environ.get("SPOTIFY_REFRESH_TOKEN"),
+    help="A refresh token issued to your spotify application, to read private playlists and saved tracks without "
+         "--spotify-token. Defaults to the SPOTIFY_REFRESH_TOKEN environment variable"
+)
+parser.add_argument(
+    "--spotify-workers",
+    type=int,
+    default=4,
+    help="The number of pages of a playlist to request from spotify at the same time. Default %(default)d"
+)
+parser.add_argument(
+    "--spotify-cache",
+    type=str,
+    default=default_source_cache_path(),
+    help="Directory to keep a copy of each spotify playlist in, so unchanged playlists aren't requested again. "
+         "Default '%(default)s'"
+)
+parser.add_argument(
+    "--no-spotify-cache",
+    action="store_true",
+    default=False,
+    help="Always request every spotify playlist, and don't keep copies of them."
+)
+parser.add_argument(
+    "--spotify-api-url",
+    type=str,
+    default=SPOTIFY_API_URL,
+    help="The base URL of the Spotify Web API, e.g. to use a stub server for testing. Default '%(default)s'"
+)
+parser.add_argument(
+    "--spotify-accounts-url",
+    type=str,
+    default=SPOTIFY_ACCOUNTS_URL,
+    help="The base URL of the spotify accounts service, which issues access tokens. Default '%(default)s'"
+)
+parser.add_argument(
+    "files",
+    nargs="*",
+    metavar="PLAYLIST_CSV",
+    help="One or more paths to CSV playlist files. Not needed with --drain-queue, --apply or --spotify-playlist"
 )
-parser.add_argument("files", nargs="+", metavar="PLAYLIST_CSV", help="One or more paths to CSV playlist files")
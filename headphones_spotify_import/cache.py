@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from os import PathLike
+from typing import Optional
+
+# How long a failed lookup is remembered before the album is searched for again, in seconds
+DEFAULT_NEGATIVE_TTL = 7 * 24 * 60 * 60
+
+CacheEntry = namedtuple("CacheEntry", ["album_id", "resolved_at"])
+
+
+def default_cache_path() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "headphones-spotify-import", "albums.sqlite3")
+
+
+class AlbumCache:
+    def __init__(self, path: "PathLike | str", negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        """
+        A persistent cache of spotify album URIs to the musicbrainz album IDs they were resolved to.
+        Safe to share between threads.
+        :param path: The path of the SQLite database. It will be created if it does not exist.
+        :param negative_ttl: Optional. How many seconds to remember albums that could not be found.
+        """
+        self.path = path
+        self.negative_ttl = negative_ttl
+
+        directory = os.path.dirname(os.fspath(path))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.fspath(path), check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS album_ids ("
+                " uri TEXT PRIMARY KEY,"
+                " album_id TEXT,"
+                " resolved_at REAL NOT NULL"
+                ")"
+            )
+
+    def lookup(self, uri: str) -> Optional[CacheEntry]:
+        """
+        Looks up a previously resolved album.
+        :param uri: The spotify album URI.
+        :return: A `CacheEntry`, whose `album_id` is `None` for albums that could not be found, or `None` if the album
+                 is not cached or its negative result has expired.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT album_id, resolved_at FROM album_ids WHERE uri = ?", (uri,)).fetchone()
+
+        if not row:
+            return None
+
+        entry = CacheEntry(*row)
+        if entry.album_id is None and self._is_expired(entry):
+            return None
+
+        return entry
+
+    def store(self, uri: str, album_id: Optional[str]):
+        """
+        Records the result of searching for an album.
+        :param uri: The spotify album URI.
+        :param album_id: The musicbrainz album ID, or `None` if the album could not be found.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO album_ids (uri, album_id, resolved_at) VALUES (?, ?, ?)",
+                (uri, album_id, time.time())
+            )
+
+    def prune(self, max_age: Optional[float] = None) -> int:
+        """
+        Removes expired negative results, and optionally any result older than `max_age`.
+        :param max_age: Optional. If set, results resolved more than this many seconds ago are removed too.
+        :return: The number of entries removed.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                "DELETE FROM album_ids WHERE album_id IS NULL AND resolved_at < ?", (now - self.negative_ttl,)
+            ).rowcount
+
+            if max_age is not None:
+                removed += self._conn.execute(
+                    "DELETE FROM album_ids WHERE resolved_at < ?", (now - max_age,)
+                ).rowcount
+
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM album_ids").fetchone()[0]
+
+    def _is_expired(self, entry: CacheEntry) -> bool:
+        return entry.resolved_at < time.time() - self.negative_ttl
+
+
+__all__ = ["AlbumCache", "CacheEntry", "default_cache_path"]
@@ -0,0 +1,164 @@
+import time
+from itertools import takewhile
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import Metrics
+from .ratelimit import AdaptiveLimiter, RateLimiter
+
+# Responses worth retrying, since they're usually caused by an overloaded server or a flaky proxy
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Responses which mean the server, or musicbrainz behind it, is overloaded
+OVERLOADED_STATUSES = (429, 502, 503, 504)
+
+# The commands which search musicbrainz, and those which change the headphones library
+SEARCH_COMMANDS = ("findAlbum",)
+WRITE_COMMANDS = ("addAlbum", "queueAlbum")
+
+
+class BackoffRetry(Retry):
+    """
+    A `Retry` which also waits before the first retry. urllib3 retries immediately once, then waits `backoff_factor`
+    seconds, doubling after each retry; this waits `backoff_factor` seconds from the first retry on.
+    """
+
+    def get_backoff_time(self) -> float:
+        # Only the latest run of errors counts, like in urllib3, so redirects reset the backoff
+        consecutive_errors = len(list(takewhile(lambda x: x.redirect_location is None, reversed(self.history))))
+        if consecutive_errors == 0:
+            return 0
+
+        # backoff_max is only an attribute from urllib3 2
+        backoff_max = getattr(self, "backoff_max", Retry.DEFAULT_BACKOFF_MAX)
+        return float(max(0, min(backoff_max, self.backoff_factor * 2 ** (consecutive_errors - 1))))
+
+
+def command_limiters(search_rate: Optional[float] = None, write_rate: Optional[float] = None, adaptive: bool = False,
+                     search_workers: Optional[int] = None, write_workers: Optional[int] = None) -> dict:
+    """
+    Creates separate limiters for searches and for adding and queueing albums, for `HeadphonesClient`.
+    :param search_rate: Optional. The maximum number of searches per second.
+    :param write_rate: Optional. The maximum number of albums added or queued per second.
+    :param adaptive: If `True`, the limits adapt to how loaded the server is, up to the maximum rates.
+    :param search_workers: Optional. The maximum number of searches at the same time, when adaptive.
+    :param write_workers: Optional. The maximum number of albums added or queued at the same time, when adaptive.
+    :return: The limiter for each command.
+    """
+    limiters = {}
+    if adaptive or search_rate:
+        limiter = AdaptiveLimiter(search_rate, search_workers if adaptive else None, adaptive=adaptive, name="searches")
+        limiters.update((cmd, limiter) for cmd in SEARCH_COMMANDS)
+    if adaptive or write_rate:
+        limiter = AdaptiveLimiter(
+            write_rate, write_workers if adaptive else None, adaptive=adaptive, name="adding and queueing"
+        )
+        limiters.update((cmd, limiter) for cmd in WRITE_COMMANDS)
+    return limiters
+
+
+class HeadphonesClient:
+    def __init__(self, url: Optional[str], apikey: Optional[str], connect_timeout: float = 10, read_timeout: float = 120,
+                 retries: int = 3, backoff: float = 1.0, pool_size: int = 10, rate_limit: Optional[float] = None,
+                 metrics: Optional[Metrics] = None, limiters: Optional[dict] = None):
+        """
+        A client for the headphones API. Requests share a pool of connections, time out, and are retried with
+        exponential backoff when they fail with a connection error or a server error.
+        :param url: The base URL of headphones, e.g. http://headphones:8181
+        :param apikey: The headphones API key.
+        :param connect_timeout: Optional. How many seconds to wait for a connection to the server.
+        :param read_timeout: Optional. How many seconds to wait for the server to respond.
+        :param retries: Optional. How many times to retry a failed request.
+        :param backoff: Optional. The delay before the first retry, in seconds. It doubles after each retry.
+                        A `Retry-After` header sent by the server takes precedence.
+        :param pool_size: Optional. How many connections to keep open to the server.
+        :param rate_limit: Optional. The maximum number of requests per second to make to the server.
+        :param metrics: Optional. If set, the latency, size and retries of every request are recorded in it.
+        :param limiters: Optional. An `AdaptiveLimiter` for each command that should be limited on its own, e.g. from
+                         `command_limiters`. They apply on top of `rate_limit`.
+        """
+        self.url = url
+        self.apikey = apikey
+        self.timeout = (connect_timeout, read_timeout)
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.limiters = limiters or {}
+        self.metrics = metrics
+
+        retry = BackoffRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, cmd: str, **params) -> requests.Response:
+        """
+        Sends a command to the headphones API, waiting first if needed to stay within the rate limits.
+        :param cmd: The API command, e.g. `findAlbum`.
+        :param params: Any parameters of the command.
+        :return: The response, after checking its status.
+        """
+        limiter = self.limiters.get(cmd)
+        if limiter is not None:
+            limiter.acquire()
+        self.rate_limiter.wait()
+
+        start = time.perf_counter()
+        response = None
+        # Requests which time out or can't connect, even after retrying, are a sign of overload too
+        overloaded = True
+        try:
+            response = self.session.get(
+                self.url + "/api", params=dict(params, cmd=cmd, apikey=self.apikey), timeout=self.timeout
+            )
+            overloaded = self._overloaded(response)
+            response.raise_for_status()
+            return response
+        finally:
+            seconds = time.perf_counter() - start
+            if limiter is not None:
+                limiter.release(seconds, overloaded)
+            if self.metrics is not None:
+                self._record(cmd, seconds, response)
+
+    @staticmethod
+    def _overloaded(response: requests.Response) -> bool:
+        if response.status_code in OVERLOADED_STATUSES:
+            return True
+
+        # Failed attempts before the one that succeeded
+        retry = getattr(response.raw, "retries", None)
+        return bool(retry and retry.history)
+
+    def _record(self, cmd: str, seconds: float, response: Optional[requests.Response]):
+        if response is None:
+            self.metrics.record_request(cmd, seconds, error=True)
+            return
+
+        retry = getattr(response.raw, "retries", None)
+        self.metrics.record_request(
+            cmd,
+            seconds,
+            size=len(response.content),
+            retries=len(retry.history) if retry else 0,
+            error=not response.ok,
+        )
+
+    def close(self):
+        self.session.close()
+
+
+__all__ = ["HeadphonesClient", "command_limiters"]
@@ -28,43 +28,108 @@
 #   13. Wait. It may take a really long time to complete the script, depending on your music library size.
 ######################################################'
 
+import collections
+import contextlib
 import csv
+import functools
+import itertools
+import logging
+import multiprocessing
 import sys
-import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from os import PathLike
 from typing import Optional
 from .album import Album, Track
+from .cache import AlbumCache
+from .library import LibraryIndex
+from .log import SUCCESS, Progress, configure_logging, get_logger
+from .metrics import Metrics
+from .matching import (
+    DEFAULT_THRESHOLD, AlbumMatcher, EditionIndex, fallback_queries, format_scores, normalize, split_artists
+)
+from .pipeline import Pipeline, Stage
+from .plan import ImportPlan, write_plan
+from .client import HeadphonesClient
+from .scheduler import MAX_ATTEMPTS, QueueScheduler
+from .state import IMPORTED_STATUSES, ImportState
+from .targets import ImportTarget, target_summary
 
 import requests
 
-try:
-    # Optional since it's only needed for win32
-    import colorama
-except ImportError:
-    colorama = None
 
-# Color escape codes
-start = "\033[0;0m"
-error = "\033[1;31m"
-success = "\033[1;32m"
-warning = "\033[1;33m"
+def format_unordered_list(values, *, char="*", newline="\n", indent: int = 0):
+    indents = " " * (indent * 2 + 1)
+    return newline.join(("{indents}{char} {value}".format(indents=indents, char=char, value=str(value)) for value in values))
 
 
-def clean_str(value):
-    return re.sub(r"[^A-Za-z0-9 -]", "", value).strip()
+def _collect(items, into: list):
+    """
+    Passes through every item of `items`, appending each to `into` along the way.
+    """
+    for item in items:
+        into.append(item)
+        yield item
 
 
-def format_unordered_list(values, *, char="*", newline="\n", indent: int = 0):
-    indents = " " * (indent * 2 + 1)
-    return newline.join(("{indents}{char} {value}".format(indents=indents, char=char, value=str(value)) for value in values))
+def _target_has(status: Optional[str], queue: bool) -> bool:
+    """
+    :return: Whether a server with an album of this status has it as planned, i.e. queued too if it queues albums.
+    """
+    return status == "Queued" or (status == "Added" and not queue)
 
 
 def get_min_tracks_filter(min_tracks: int) -> callable:
-    return lambda album: album and len(album.tracks) >= min_tracks
+    return lambda album: album and album.track_count >= min_tracks
+
+
+def parse_playlist(path: "PathLike | str", keep_tracks: bool = True) -> list:
+    """
+    Parses a CSV playlist into its albums, for `Importer` to merge with those of other playlists. Runs in a separate
+    process when loading playlists in parallel, so it only returns plain tuples.
+    :param path: The path to a CSV playlist.
+    :param keep_tracks: If `False`, track names are left out.
+    :return: A list of `(album_uri, name, artists, release_date, tracks)` tuples, in the order the albums first appear
+             in the playlist, where `tracks` is a list of `(track_uri, name, artists)` tuples in playlist order.
+             Tracks which appear more than once are only included once.
+    """
+    albums = {}
+    track_uris = set()
+
+    with open(path) as f:
+        for row in csv.DictReader(f):
+            album_id = row["Album URI"]
+            album = albums.get(album_id)
+            if album is None:
+                album = albums[album_id] = (
+                    album_id, row["Album Name"], row["Album Artist Name(s)"], row["Album Release Date"], []
+                )
+
+            track_uri = row.get("Track URI")
+            if track_uri:
+                if track_uri in track_uris:
+                    continue
+                track_uris.add(track_uri)
+
+            album[4].append((track_uri, row["Track Name"] if keep_tracks else None, row["Artist Name(s)"]))
+
+    return list(albums.values())
+
+
+class ImportAborted(Exception):
+    """
+    Raised when the user chooses not to continue an import.
+    """
 
 
 class Importer:
-    def __init__(self, url: str, apikey: str, prompt: bool = True, color: bool = True, prompt_albums: bool = True):
+    def __init__(self, url: str, apikey: str, prompt: bool = True, color: bool = True, prompt_albums: bool = True,
+                 workers: int = 1, rate_limit: Optional[float] = None, cache: Optional[AlbumCache] = None,
+                 refresh_cache: bool = False, state: Optional[ImportState] = None, skip_existing: bool = False,
+                 client: Optional[HeadphonesClient] = None, keep_tracks: bool = True, add_workers: int = 1,
+                 queue_workers: int = 1, match_threshold: float = DEFAULT_THRESHOLD, fallback: bool = True,
+                 metrics: Optional[Metrics] = None, queue_scheduler: Optional[QueueScheduler] = None,
+                 progress: Optional[Progress] = None, merge_editions: bool = True, load_workers: int = 1,
+                 targets: "Optional[list[ImportTarget]]" = None):
         """
         Initialize a new importer for the given server
         :param url:
@@ -72,40 +137,110 @@ class Importer:
         :param prompt:
         :param color:
         :param prompt_almusm:
+        :param workers: The number of album searches to run at once. Defaults to `1`.
+        :param rate_limit: Optional. The maximum number of API requests per second to make to the server.
+        :param cache: Optional. A cache of previously resolved album IDs to use instead of searching again.
+        :param refresh_cache: If `True`, albums are always searched for and the results replace those in `cache`.
+        :param state: Optional. If set, albums imported by previous runs are skipped and the outcome of each album is
+                      recorded in it.
+        :param skip_existing: If `True`, the albums headphones already has are fetched first, and those albums are not
+                              added or queued again.
+        :param client: Optional. The client to communicate with headphones through. If not given, one is created with
+                       `url`, `apikey` and `rate_limit` and the default timeouts and retries.
+        :param keep_tracks: If `False`, only the number of tracks and their artists are kept in memory for each album,
+                            and the tracks of each album are not listed.
+        :param add_workers: The number of albums to add to headphones at once. Defaults to `1`.
+        :param queue_workers: The number of albums to queue at once. Defaults to `1`.
+        :param match_threshold: The minimum score, from 0 to 1, of a search result to be accepted as the album.
+        :param fallback: If `True`, albums which could not be found are searched for again at the end with more
+                         relaxed queries.
+        :param metrics: Optional. If set, the time spent in each phase and pipeline stage is recorded in it. To record
+                        requests too, it should also be given to `client`.
+        :param queue_scheduler: Optional. If set, albums are not queued as soon as they're added, but submitted to it
+                                and queued as it releases them.
+        :param progress: Optional. If set, it's updated with the status of each album as the import goes on.
+        :param merge_editions: If `True`, other editions of an album in the playlists, e.g. its explicit and clean
+                               versions or a deluxe edition, are merged into it and only searched for once.
+        :param load_workers: The number of processes to parse playlist files with at once. Defaults to `1`, which
+                             parses them one at a time in this process. The processes are spawned, so they import the
+                             main module again: a script which sets this has to start the import under an
+                             `if __name__ == "__main__":` guard.
+        :param targets: Optional. Other headphones servers to add, and optionally queue, every album on too. Albums
+                        are only searched for on this importer's server.
         """
-        self.url = url
-        self.apikey = apikey
+        if client is None:
+            pool_size = max(1, workers) + max(1, add_workers) + max(1, queue_workers)
+            client = HeadphonesClient(url, apikey, pool_size=pool_size, rate_limit=rate_limit, metrics=metrics)
+
+        self.client = client
         self.color = color
         self.prompt = prompt
         self.prompt_albums = prompt_albums
-        self.__colorama_initialized = False
-
-    def _init_colorama(self):
-        if not self.__colorama_initialized:
-            self.__colorama_initialized = True
-
-            if colorama:
-                colorama.init()
+        self.workers = max(1, workers)
+        self.add_workers = max(1, add_workers)
+        self.queue_workers = max(1, queue_workers)
+        self.cache = cache
+        self.refresh_cache = refresh_cache
+        self.state = state
+        self.skip_existing = skip_existing
+        self.keep_tracks = keep_tracks
+        self.matcher = AlbumMatcher(match_threshold)
+        self.fallback = fallback
+        self.metrics = metrics
+        self.queue_scheduler = queue_scheduler
+        self._pending_albums = {}
+        self.progress = progress
+        self.merge_editions = merge_editions
+        self.load_workers = max(1, load_workers)
+        self.targets = list(targets or ())
+        # The status of each album on each of the other servers, by target name and album URI
+        self._target_statuses = {target.name: {} for target in self.targets}
+        # Albums which previous runs imported, but only to some of the servers: the URIs of those the main server
+        # already has, and the names of the other servers which already have each album, by URI
+        self._imported_uris = set()
+        self._imported_targets = {}
+        self.albums = []
+        # The first album found to have each album ID, so albums which turn out to be the same are only added once
+        self._resolved_albums = {}
+        # What will be done with each album when planning an import, and the plan being applied
+        self._plan_actions = {}
+        self._applying_plan = None
+        self.logger = get_logger()
+
+        if not self.logger.handlers:
+            # Nothing has set up logging, so just print everything like a script would
+            configure_logging(color=color, buffered=False)
+
+    @property
+    def url(self) -> str:
+        return self.client.url
+
+    @url.setter
+    def url(self, value: str):
+        self.client.url = value
+
+    @property
+    def apikey(self) -> str:
+        return self.client.apikey
+
+    @apikey.setter
+    def apikey(self, value: str):
+        self.client.apikey = value
 
     def debug(self, msg: str):
-        self._init_colorama()
-        print(start + msg)
+        self.logger.debug(msg)
 
     def info(self, msg: str):
-        self._init_colorama()
-        print(start + msg)
+        self.logger.info(msg)
 
     def success(self, msg: str):
-        self._init_colorama()
-        print(success + msg)
+        self.logger.log(SUCCESS, msg)
 
     def warn(self, msg: str):
-        self._init_colorama()
-        print(warning + msg)
+        self.logger.warning(msg)
 
     def error(self, msg: str):
-        self._init_colorama()
-        print(error + msg)
+        self.logger.error(msg)
 
     def prompt_input(self, prompt, default=None):
         response = ""
@@ -131,82 +266,81 @@ class Importer:
         else:
             return True
 
-    def headphones_find_album_id(self, album_info: Album) -> str:
+    def _api_get(self, payload: dict, client: Optional[HeadphonesClient] = None) -> requests.Response:
         """
-        Comminucates with headphones to search for the given album and return the first matching album ID.
+        Sends a request to the headphones API through the client.
+        :param payload: The query parameters for the request, including `cmd`.
+        :param client: Optional. The client of another server to send the request to.
+        :return: The response, after checking its status.
+        """
+        return (client or self.client).get(**payload)
+
+    def headphones_find_album_id(self, album_info: Album, name: Optional[str] = None) -> str:
+        """
+        Comminucates with headphones to search for the given album and return the ID of the best matching result.
         :param album_info: A dict describing the album, as returned by `import_playlist`.
+        :param name: Optional. The query to search with. Defaults to the artists, name and year of the album.
         :return: The album ID as a string, or `None` if the album was not found.
         """
         payload = {
             "cmd": "findAlbum",
-            "name": str(album_info),
-            "apikey": self.apikey,
+            "name": name or str(album_info),
         }
 
-        response = requests.get(self.url + "/api", params=payload)
-        response.raise_for_status()
-
+        response = self._api_get(payload)
+
+        # Match fields:
+        # * uniquename (artist)
+        # * title (album)
+        # * id (artist)
+        # * albumid (album)
+        # * url (artist)
+        # * albumurl (album)
+        # * score
+        # * date
+        # * country
+        # * formats
+        # * tracks (album)
+        # * rgid (release group?)
+        # * rgtype (release group?)
         matches = response.json()
-        for match in matches:
-            # Match fields:
-            # * uniquename (artist)
-            # * title (album)
-            # * id (artist)
-            # * albumid (album)
-            # * url (artist)
-            # * albumurl (album)
-            # * score
-            # * date
-            # * country
-            # * formats
-            # * tracks (album)
-            # * rgid (release group?)
-            # * rgtype (release group?)
-
-            match_title = clean_str(match["title"]).lower()
-            match_artist = clean_str(match["uniquename"]).lower()
-            album_title = clean_str(album_info.name).lower()
-            album_artists = clean_str(album_info.artists).lower()
-
-            name_match = (
-                    match_title == album_title
-                    or match_title.startswith(album_title)
-            )
-            artist_match = (
-                    match_artist in album_artists
-                    or any((clean_str(track.artist).lower() == match_artist for track in album_info.tracks))
-            )
 
-            if name_match and artist_match:
-                return match["albumid"]
+        ranked = self.matcher.rank(album_info, matches)
+        for total, scores, match in ranked[:3]:
+            self.debug(" Candidate for {}: {}".format(album_info, format_scores(total, scores, match)))
+
+        match = self.matcher.best_match(ranked)
+        if match:
+            return match["albumid"]
 
         self.warn(
             "Warning. Album '{}' not found after searching {} possible matches.".format(payload["name"], len(matches))
         )
         return None
 
-    def headphones_add_album(self, album_id: str):
+    def headphones_add_album(self, album_id: str, client: Optional[HeadphonesClient] = None):
         """
         Communicates with headphones to download an album by its ID
         :param album_id: The ID of the album, as defined by its musicbrainz
+        :param client: Optional. The client of another server to add the album to.
         :return:
         """
 
         payload = {
             "cmd": "addAlbum",
             "id": album_id,
-            "apikey": self.apikey,
         }
 
-        response = requests.get(self.url + "/api", params=payload)
-        response.raise_for_status()
+        self._api_get(payload, client)
 
-    def headphones_queue_album(self, album_id: str, new: bool = True, lossless: bool = True):
+    def headphones_queue_album(self, album_id: str, new: bool = True, lossless: bool = True,
+                               client: Optional[HeadphonesClient] = None):
         """
         Communicates with headphones to queue an album (i.e. mark it as wanted and search for it) by `album_id`
         :param album_id:
         :param new: Optional. Whether to look for new versions. Defaults to `True`.
         :param lossless: Optional. Whether to only search for lossless versions. Defaults to `True`.
+        :param client: Optional. The client of another server to queue the album on.
         :return:
         """
 
@@ -215,25 +349,531 @@ class Importer:
             "id": album_id,
             "new": new,
             "lossless": lossless,
-            "apikey": self.apikey,
         }
 
-        response = requests.get(self.url + "/api", params=payload)
-        response.raise_for_status()
+        self._api_get(payload, client)
 
-    def import_playlist(self, files: "list[PathLike]", queue: bool = False, lossless: bool = True, min_tracks: Optional[int] = 1):
+    def headphones_fetch_library(self, albums: "list[Album]" = None) -> LibraryIndex:
         """
-        Imports and optionally queues a playlist.
-        :param files: A list of paths to CSV playlist files
-        :param queue: If `True`, albums will be queued after they are imported.
-        :param lossless: If `True`, only lossless albums will be added when queued. Defaults to `True`.
-        :param min_tracks: If set, a track from this album must be included at least `min_tracks` times to be included.
-        :return: A dictionary summarizing the actions that were taken.
+        Communicates with headphones to build an index of the albums it already has.
+        :param albums: Optional. If given, only the albums of headphones artists who are an album artist of one of these
+                       albums are fetched, along with all wanted and snatched albums. Otherwise, the albums of every
+                       artist are fetched.
+        :return: The index of albums.
         """
+        library = LibraryIndex()
 
-        if not files:
-            files = [self.prompt_input("Playlist File [all.csv]: ", default="all.csv")]
+        for cmd in ("getWanted", "getSnatched"):
+            for match in self._api_get({"cmd": cmd}).json():
+                library.add(match["AlbumID"], match["Status"])
+
+        if albums is None or albums:
+            artist_names = None
+            if albums is not None:
+                artist_names = {artist for album in albums for artist in split_artists(album.artists)}
+
+            artist_ids = [
+                artist["ArtistID"] for artist in self._api_get({"cmd": "getIndex"}).json()
+                if artist_names is None or normalize(artist["ArtistName"]) in artist_names
+            ]
+
+            def fetch_artist_albums(artist_id):
+                return self._api_get({"cmd": "getArtist", "id": artist_id}).json()["albums"]
+
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for artist_albums in executor.map(fetch_artist_albums, artist_ids):
+                    for match in artist_albums:
+                        library.add(match["AlbumID"], match["Status"])
+
+        return library
+
+    def _phase(self, name: str):
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.phase(name)
+
+    def _stage(self, name: str, fn, workers: int) -> Stage:
+        """
+        Creates a pipeline stage, timing each call of `fn` if there are metrics.
+        """
+        if self.metrics is None:
+            return Stage(name, fn, workers)
+
+        def timed(album):
+            with self.metrics.stage(name, album):
+                return fn(album)
+
+        return Stage(name, timed, workers)
+
+    def _record(self, album: Album):
+        if self.state is not None:
+            self.state.record(album)
+        if self._applying_plan is not None:
+            self._applying_plan.record(album)
+        if self.progress is not None:
+            self.progress.update(album, album.status)
+
+    def _search_album(self, album: Album):
+        """
+        Searches for a single album's ID, capturing any request error so the find stage can report it.
+        Uses and updates the album ID cache, if there is one.
+        :param album: The album to search for.
+        :return: A tuple of `(album_id, cached, error)`.
+        """
+        use_cache = self.cache is not None and album.uri
+
+        if use_cache and not self.refresh_cache:
+            for uri in album.uris:
+                entry = self.cache.lookup(uri)
+                if entry:
+                    return entry.album_id, True, None
+
+        try:
+            album_id = self.headphones_find_album_id(album)
+        except requests.exceptions.RequestException as e:
+            return None, False, e
+
+        # Misses are only cached once the fallback queries have failed too
+        if use_cache and (album_id or not self.fallback):
+            self._cache_album_id(album, album_id)
+
+        return album_id, False, None
+
+    def _find_album_stage(self, album: Album, misses: Optional[list] = None) -> bool:
+        """
+        Pipeline stage which searches for an album's ID. With several workers, albums are reported as their searches
+        finish rather than in playlist order; the final list of statuses is in playlist order.
+        :param album: The album.
+        :param misses: Optional. Albums which were searched for but not found are appended to this list.
+        :return: `True` if the album's ID was found.
+        """
+        if album.uri in self._imported_uris:
+            # A previous run found it, but some of the other servers still need it
+            return self._claim_album_id(album)
+
+        album_id, cached, err = self._search_album(album)
+
+        if err:
+            album.status = "Error: Could not find ID: " + str(err.args)
+            self.error("Error. While searching musicbrainz for {album}: {err}".format(err=err.args, album=album))
+            self._record(album)
+            return False
+
+        album.musicbrainz_id = album_id
+
+        source = " (cached)" if cached else ""
+        if not album_id:
+            self.warn("Could not find album_id for {}{}".format(album, source))
+            album.status = "Error: Could not find album_id"
+            self._record(album)
+
+            if misses is not None and not cached:
+                misses.append(album)
+            return False
+
+        self.success(
+            "Mapped {album} to album ID: {album_id}{source}".format(album=album, album_id=album_id, source=source)
+        )
+        return self._claim_album_id(album)
+
+    def _cache_album_id(self, album: Album, album_id: Optional[str]):
+        for uri in album.uris:
+            self.cache.store(uri, album_id)
+
+    def _claim_album_id(self, album: Album) -> bool:
+        """
+        Checks that no other album was found to have the same album ID, e.g. another edition that wasn't merged
+        into it, so each album is only added and queued once.
+        :param album: The album, with its `musicbrainz_id` set.
+        :return: `True` if it's the first album with its ID.
+        """
+        # setdefault is atomic, so only one of the albums with the same ID gets to be the first
+        first = self._resolved_albums.setdefault(album.musicbrainz_id, album)
+        if first is album:
+            return True
+
+        self.info("{album} is the same album as {first}, skipping it".format(album=album, first=first))
+        album.status = "Duplicate"
+        self._record(album)
+        return False
+
+    def _find_album_fallback_stage(self, album: Album) -> bool:
+        """
+        Pipeline stage which searches again for an album that could not be found, with progressively more relaxed
+        queries, until one finds it.
+        :param album: The album.
+        :return: `True` if the album's ID was found.
+        """
+        queries = fallback_queries(album)
+
+        for query in queries:
+            try:
+                album_id = self.headphones_find_album_id(album, name=query)
+            except requests.exceptions.RequestException as e:
+                album.status = "Error: Could not find ID: " + str(e.args)
+                self.error("Error. While searching musicbrainz for {album}: {err}".format(err=e.args, album=album))
+                self._record(album)
+                return False
+
+            if album_id:
+                album.musicbrainz_id = album_id
+                album.status = None
+                if self.cache is not None:
+                    self._cache_album_id(album, album_id)
+
+                self.success(
+                    "Mapped {album} to album ID: {album_id} (searched for '{query}')".format(
+                        album=album, album_id=album_id, query=query
+                    )
+                )
+                return self._claim_album_id(album)
+
+        if self.cache is not None:
+            self._cache_album_id(album, None)
+
+        self.warn("Could not find album_id for {} after {} more searches".format(album, len(queries)))
+        return False
+
+    def _add_album_stage(self, album: Album, library: Optional[LibraryIndex], queue: bool) -> bool:
+        """
+        Pipeline stage which adds an album to headphones, unless `library` says headphones already has it.
+        :param album: The album, with its `musicbrainz_id` set.
+        :param library: Optional. The albums headphones already has.
+        :param queue: Whether the album should be queued after it's added.
+        :return: `True` if the album should be queued.
+        """
+        if album.uri in self._imported_uris:
+            # Only the other servers needed it. Its state entry keeps the status a previous run recorded.
+            album.status = "Already imported"
+            if self.progress is not None:
+                self.progress.update(album, album.status)
+            return False
+
+        if library is not None and library.is_wanted(album.musicbrainz_id):
+            self.info("Headphones already has album {}".format(album))
+            album.status = "Already present"
+            self._record(album)
+            return False
+
+        try:
+            if library is not None and album.musicbrainz_id in library:
+                # Headphones tracks the album but isn't looking for it, so only queueing can change anything
+                self.info("Headphones already has album {}".format(album))
+                if not queue:
+                    album.status = "Already present"
+                    self._record(album)
+                    return False
+            else:
+                self.info("Adding album {}...".format(album))
+                self.headphones_add_album(album.musicbrainz_id)
+                self.success("Added {}!".format(album))
+            album.status = "Added"
+        except requests.exceptions.RequestException as e:
+            album.status = "Error: Not added"
+            self.error("Error. While adding {album} to headphones: {err}".format(err=e.args, album=album))
+
+        self._record(album)
+        return queue and album.status == "Added"
+
+    def target_statuses(self, album: Album) -> dict:
+        """
+        :return: The status of an album on each of the `targets` servers it was sent to, by name.
+        """
+        return {name: statuses[album.uri] for name, statuses in self._target_statuses.items() if album.uri in statuses}
+
+    def _target_album_stage(self, album: Album, target: ImportTarget, queue: bool, lossless: bool) -> bool:
+        """
+        Pipeline stage which adds, and optionally queues, an album on another headphones server.
+        :param album: The album, with its `musicbrainz_id` set.
+        :param target: The server.
+        :param queue: Whether the album should be queued after it's added, unless the target says otherwise.
+        :param lossless: Whether to only search for lossless versions, unless the target says otherwise.
+        :return: `True`, so the album goes on to the other servers whatever happened on this one.
+        """
+        if target.name in self._imported_targets.get(album.uri, ()):
+            return True
+
+        queue = target.queue if target.queue is not None else queue
+        lossless = target.lossless if target.lossless is not None else lossless
+
+        status = "Error: Not added"
+        try:
+            self.headphones_add_album(album.musicbrainz_id, client=target.client)
+            status = "Added"
+            if queue:
+                status = "Error: Not queued"
+                self.headphones_queue_album(album.musicbrainz_id, lossless=lossless, client=target.client)
+                status = "Queued"
+            self.success("{} {} on {}".format(status, album, target))
+        except requests.exceptions.RequestException as e:
+            self.error("Error. While adding {album} to {target}: {err}".format(album=album, target=target, err=e.args))
+
+        self._target_statuses[target.name][album.uri] = status
+        if self.state is not None:
+            self.state.record_target(album, target.name, status)
+        if self._applying_plan is not None:
+            self._applying_plan.record_target(album, target.name, status, _target_has(status, queue))
+        return True
+
+    def _plan_album_stage(self, album: Album, library: Optional[LibraryIndex], queue: bool) -> bool:
+        """
+        Pipeline stage which decides what to do with an album that was found, instead of adding it.
+        :param album: The album, with its `musicbrainz_id` set.
+        :param library: Optional. The albums headphones already has.
+        :param queue: Whether the album should be queued after it's added.
+        :return: `False`
+        """
+        if library is not None and library.is_wanted(album.musicbrainz_id):
+            album.status = "Already present"
+        else:
+            # Albums headphones tracks but isn't looking for only need queueing
+            add = library is None or album.musicbrainz_id not in library
+            if add or queue:
+                self._plan_actions[album.uri] = (add, queue)
+                album.status = "Planned"
+            else:
+                album.status = "Already present"
+
+        self._record(album)
+        return False
+
+    def _queue_album_stage(self, album: Album, lossless: bool) -> bool:
+        """
+        Pipeline stage which queues an album that was added to headphones.
+        :param album: The album, with its `musicbrainz_id` set.
+        :param lossless: Whether to only search for lossless versions.
+        :return: `True`
+        """
+        if self.queue_scheduler is not None:
+            self._pending_albums[album.musicbrainz_id] = album
+            self.queue_scheduler.submit(album.musicbrainz_id, lossless, name=str(album), uris=album.uris)
+            album.status = "Queue pending"
+            self._record(album)
+            return True
+
+        self.info("Queueing album {}".format(album))
+        try:
+            self.headphones_queue_album(album.musicbrainz_id, lossless=lossless)
+            album.status = "Queued"
+        except requests.exceptions.RequestException as e:
+            album.status = "Error: Not queued"
+            self.error("Error. While queueing {album} to headphones: {err}".format(err=e.args, album=album))
+
+        self._record(album)
+        return True
+
+    def _target_stages(self, queue: bool, lossless: bool) -> "list[Stage]":
+        """
+        The pipeline stages which add, and optionally queue, albums on each of the other servers. They go before the
+        stages of this importer's server, since albums only go on from those if they were added.
+        """
+        return [
+            self._stage(
+                "add-{}".format(target),
+                functools.partial(self._target_album_stage, target=target, queue=queue, lossless=lossless),
+                self.add_workers,
+            )
+            for target in self.targets
+        ]
+
+    def _import_stages(self, library: Optional[LibraryIndex], queue: bool, lossless: bool) -> "list[Stage]":
+        """
+        The pipeline stages which add, and optionally queue, albums whose IDs were found, on every server.
+        """
+        stages = self._target_stages(queue, lossless)
+        stages.append(
+            self._stage("add", functools.partial(self._add_album_stage, library=library, queue=queue), self.add_workers)
+        )
+        if queue:
+            stages.append(
+                self._stage("queue", functools.partial(self._queue_album_stage, lossless=lossless), self.queue_workers)
+            )
+        return stages
+
+    @contextlib.contextmanager
+    def _releasing_queue(self, queue: bool):
+        """
+        While the block runs, releases albums from the queue scheduler, if albums are being queued and there is one.
+        Albums left over from previous runs are released first, then new ones as they're added.
+        """
+        if not queue or self.queue_scheduler is None:
+            yield
+            return
+
+        self.queue_scheduler.start(self._release_queued_album, self._queued_album_released)
+        try:
+            yield
+        finally:
+            self.queue_scheduler.stop()
+
+            if len(self.queue_scheduler):
+                self.warn(
+                    "{} albums are still waiting to be queued in '{}'. Run with --drain-queue to queue them."
+                    .format(len(self.queue_scheduler), self.queue_scheduler.path)
+                )
+
+    def _release_queued_album(self, album_id: str, lossless: bool):
+        self.info("Queueing album {}".format(album_id))
+        self.headphones_queue_album(album_id, lossless=lossless)
+
+    def _queued_album_released(self, entry: dict, error: Optional[Exception]):
+        """
+        Called by the queue scheduler once it has tried to queue an album.
+        """
+        name = entry["name"] or entry["id"]
+        album = self._pending_albums.get(entry["id"])
+
+        if error is None:
+            self.success("Queued {}".format(name))
+            status = "Queued"
+        elif entry["attempts"] >= MAX_ATTEMPTS:
+            self.error("Error. While queueing {album} to headphones, giving up: {err}".format(err=error.args, album=name))
+            status = "Error: Not queued"
+        else:
+            self.warn("Warning. While queueing {album} to headphones, will retry: {err}".format(err=error.args, album=name))
+            return
+
+        if album is not None:
+            album.status = status
+            self._record(album)
+        elif self.state is not None:
+            # Submitted by an earlier run, whose state entry still says it's pending
+            self.state.record_status(entry.get("uris", ()), status)
+
+    def drain_queue(self) -> dict:
+        """
+        Queues every album left pending in the queue scheduler by previous imports, at the scheduler's rate.
+        :return: A dictionary of how many albums were `queued`, `failed`, and are still `pending`.
+        """
+        if self.queue_scheduler is None:
+            raise RuntimeError("Draining the queue needs a queue scheduler")
+
+        self._prompt_server()
+
+        results = dict(queued=0, failed=0)
+
+        def released(entry, error):
+            self._queued_album_released(entry, error)
+            if error is None:
+                results["queued"] += 1
+            elif entry["attempts"] >= MAX_ATTEMPTS:
+                results["failed"] += 1
+
+        self.info("Queueing {} pending albums...".format(len(self.queue_scheduler)))
+        self.queue_scheduler.drain(self._release_queued_album, released)
+
+        results["pending"] = len(self.queue_scheduler)
+        self.info("Queued {queued} albums ({failed} failed, {pending} still pending)".format_map(results))
+        return results
+
+    def apply_plan(self, plan: ImportPlan) -> dict:
+        """
+        Adds and queues the albums in a plan written by `import_playlist`, without searching for them again. Albums
+        which a previous run already added and queued are skipped.
+        :param plan: The plan.
+        :return: A dictionary of how many albums were `added`, `queued`, `queue_pending` and `failed`, were `done_before`
+                 by previous runs, and the `total` number of albums carried out by this run. With other servers, the
+                 summary of each is under `targets`.
+        """
+        self._prompt_server()
+
+        entries = {entry["uri"]: entry for entry in plan.pending()}
+        albums = [plan.album(entry) for entry in entries.values()]
+        done_before = len(plan.done)
+
+        self.info("About to be performed:")
+        self.info(" * Add or queue {} albums from plan '{}' ({} done by previous runs)".format(
+            len(albums), plan.path, done_before
+        ))
+        if not self.prompt_continue("Continue? (y/n) "):
+            raise ImportAborted("Import cancelled")
 
+        if self.progress is not None:
+            self.progress.set_total(len(albums))
+
+        plan.targets = {target.name for target in self.targets}
+        # Albums a previous run carried out on this server, but not yet on every other one
+        self._imported_uris = {uri for uri in entries if uri in plan.applied}
+        self._imported_targets = {uri: set(plan.target_done[uri]) for uri in entries if uri in plan.target_done}
+
+        def add_stage(album: Album) -> bool:
+            entry = entries[album.uri]
+            if not entry["add"] and album.uri not in self._imported_uris:
+                # Headphones already tracks the album, so it only needs queueing
+                return True
+            return self._add_album_stage(album, None, entry["queue"])
+
+        stages = self._target_stages(plan.queue, plan.lossless)
+        stages.append(self._stage("add", add_stage, self.add_workers))
+        queue = any(entry["queue"] for entry in entries.values())
+        if queue:
+            stages.append(self._stage(
+                "queue", functools.partial(self._queue_album_stage, lossless=plan.lossless), self.queue_workers
+            ))
+
+        self._applying_plan = plan
+        try:
+            with self._releasing_queue(queue), self._phase("apply"):
+                Pipeline(stages).run(albums)
+        finally:
+            self._applying_plan = None
+
+        if self.progress is not None:
+            self.progress.finish()
+
+        summary = dict(
+            added=sum((album.status == "Added" for album in albums)),
+            queued=sum((album.status == "Queued" for album in albums)),
+            queue_pending=sum((album.status == "Queue pending" for album in albums)),
+            failed=sum((bool(album.status) and album.status.startswith("Error") for album in albums)),
+            done_before=done_before,
+            total=len(albums),
+        )
+
+        if self.metrics is not None:
+            self.metrics.summary = summary
+
+        self.info(
+            "Queued {queued} (pending {queue_pending}) / Added {added} / {total} albums "
+            "(failed {failed}, done by previous runs {done_before})".format_map(summary)
+        )
+        for album in albums:
+            status_text = "{album}: {status}".format(album=album, status=album.status)
+            if album.status in ("Added", "Queued", "Queue pending"):
+                self.success(status_text)
+            else:
+                self.error(status_text)
+
+        return self._summarize_targets(summary)
+
+    def _summarize_targets(self, summary: dict) -> dict:
+        """
+        Logs the summary of each of the other servers.
+        :param summary: The summary of the import.
+        :return: The summary with that of each other server under `targets`, by server name.
+        """
+        if not self.targets:
+            return summary
+
+        targets = {name: target_summary(statuses.values()) for name, statuses in self._target_statuses.items()}
+        if self.metrics is not None:
+            self.metrics.targets = targets
+
+        for name, target in targets.items():
+            message = "{name}: Queued {queued} / Added {added} / {total} albums (failed {failed})".format(
+                name=name, **target
+            )
+            if target["failed"]:
+                self.warn(message)
+            else:
+                self.info(message)
+
+        return dict(summary, targets=targets)
+
+    def _prompt_server(self):
+        """
+        Prompts for the headphones URL and API key if they haven't been given.
+        """
         if not self.url:
             self.url = self.prompt_input("Headphones URL [http://jellyfin:8181]: ", default="http://jellyfin:8181")
 
@@ -243,23 +883,174 @@ class Importer:
         if not self.apikey:
             self.apikey = self.prompt_input("Headphones API key: ")
 
+    def _skip_imported(self, albums, queue: bool, targets: "list[ImportTarget]"):
+        """
+        Filters out albums which the import state says were imported by previous runs, to every server.
+        :param albums: An iterable of albums.
+        :param queue: Whether albums will be queued, in which case albums which were only added are not skipped.
+        :param targets: The other servers albums will be added to.
+        :return: A generator of the albums which still need importing.
+        """
+        # Albums that were only added can still need queueing
+        imported_statuses = ("Queued", "Already present") if queue else IMPORTED_STATUSES
+
+        for album in albums:
+            entry = self.state.get(album.uri) if self.state is not None and album.uri else None
+            if entry is None:
+                yield album
+                continue
+
+            imported_targets = {target.name for target in targets if self._is_imported_to(entry, target, queue)}
+            if imported_targets:
+                self._imported_targets[album.uri] = imported_targets
+
+            if not self._is_imported(album.uri, imported_statuses):
+                yield album
+            elif len(imported_targets) < len(targets):
+                # Still needed by some of the other servers, which can be sent the album ID found before
+                album.musicbrainz_id = entry["musicbrainz_id"]
+                self._imported_uris.add(album.uri)
+                yield album
+            else:
+                album.status = "Already imported"
+                album.musicbrainz_id = entry["musicbrainz_id"]
+
+    @staticmethod
+    def _is_imported_to(entry: dict, target: ImportTarget, queue: bool) -> bool:
+        status = (entry.get("targets") or {}).get(target.name)
+        return _target_has(status, target.queue if target.queue is not None else queue)
+
+    def _is_imported(self, uri: str, imported_statuses) -> bool:
+        if self.state.is_imported(uri, imported_statuses):
+            return True
+
+        # Albums still waiting in the queue scheduler will be queued without being searched for and added again
+        entry = self.state.get(uri)
+        return (
+            self.queue_scheduler is not None and entry is not None and entry["status"] == "Queue pending"
+            and entry["musicbrainz_id"] in self.queue_scheduler
+        )
+
+    def _select_albums(self, albums, filters):
+        """
+        Prints each album with the tracks we want from it, and yields those which pass all `filters`.
+        :param albums: An iterable of albums.
+        :param filters: A list of functions which take an album and return `True` if it should be added.
+        :return: A generator of the albums to add.
+        """
+        # The tracks are only interesting when deciding whether to add each album
+        track_level = logging.INFO if self.prompt_albums else logging.DEBUG
+
+        for album in albums:
+            self.info("{}".format(album))
+            if album.tracks is not None:
+                self.logger.log(track_level, " Tracks:")
+                self.logger.log(track_level, format_unordered_list(album.tracks))
+            else:
+                self.logger.log(track_level, " Tracks: {}".format(album.track_count))
+
+            if all((f(album) for f in filters)):
+                self.success(" Will be added!")
+                yield album
+            else:
+                self.info(" Will be skipped!")
+                album.status = "Skipped"
+                self._record(album)
+
+    def import_playlist(self, files: "list[PathLike]", queue: bool = False, lossless: bool = True, min_tracks: Optional[int] = 1,
+                        rows=None, plan: "Optional[PathLike]" = None):
+        """
+        Imports and optionally queues a playlist. The albums of the import, with their final status, are left in
+        `self.albums`.
+        :param files: A list of paths to CSV playlist files
+        :param rows: Optional. An iterable of dicts with the columns of an Exportify CSV playlist, e.g. a
+                     `sources.SpotifySource`, to import after `files`.
+        :param queue: If `True`, albums will be queued after they are imported.
+        :param lossless: If `True`, only lossless albums will be added when queued. Defaults to `True`.
+        :param min_tracks: If set, at least `min_tracks` different tracks from an album must be included for it to be added.
+        :param plan: Optional. If set, albums are only searched for, and what would be done with each of them is
+                     written to this plan file, for `apply_plan`. Nothing is added or queued.
+        :return: A dictionary summarizing the actions that were taken. With other servers, the summary of each is
+                 under `targets`.
+        """
+
+        if not files and rows is None:
+            files = [self.prompt_input("Playlist File [all.csv]: ", default="all.csv")]
+
+        self._prompt_server()
+
         self.info("Caution: This may take a very long time to complete, Depending on your music library size.")
 
-        self.info("Loading {} playlist file(s):".format(len(files)))
-        self.info("files: {}".format(files))
-        self.info(format_unordered_list(files))
+        if files:
+            self.info("Loading {} playlist file(s):".format(len(files)))
+            self.info("files: {}".format(files))
+            self.info(format_unordered_list(files))
+
+        # Without any prompts, albums are searched for as soon as they're loaded, while the playlists are still loading.
+        stream = not self.prompt
 
         # Load the album and track info from the playlist file
-        albums = self.load_playlist_albums(*files)
+        found_albums = {}
+        editions = EditionIndex() if self.merge_editions else None
+        self._resolved_albums = {}
+        self._plan_actions = {}
+        self._imported_uris = set()
+        self._imported_targets = {}
+        loaders = []
+        if files:
+            loaders.append(self.iter_playlist_albums(
+                *files,
+                min_tracks=max(1, min_tracks) if stream else 1,
+                keep_tracks=self.keep_tracks,
+                found_albums=found_albums,
+                editions=editions,
+            ))
+        if rows is not None:
+            loaders.append(self.iter_rows_albums(
+                rows,
+                min_tracks=max(1, min_tracks) if stream else 1,
+                keep_tracks=self.keep_tracks,
+                found_albums=found_albums,
+                editions=editions,
+            ))
+        albums = itertools.chain.from_iterable(loaders)
+
+        if self.metrics is not None:
+            albums = self.metrics.timed_iter("load", albums)
+
+        if not stream:
+            albums = list(albums)
+
+        library = None
+        if self.skip_existing:
+            self.info("Fetching the albums headphones already has...")
+            try:
+                with self._phase("fetch_library"):
+                    library = self.headphones_fetch_library(None if stream else albums)
+                self.info("Headphones already has {} albums".format(len(library)))
+            except requests.exceptions.RequestException as e:
+                self.error("Error. While fetching the headphones library, all albums will be added: {}".format(e.args))
 
-        self.info("About to be performed:")
+        albums_to_search = self._skip_imported(albums, queue, self.targets if plan is None else [])
 
-        self.info(" * Search for {} albums".format(len(albums)))
+        if not stream:
+            albums_to_search = list(albums_to_search)
 
-        if not self.prompt_continue("Continue? (y/n) "):
-            sys.exit(1)
+            if self.state is not None:
+                self.info(
+                    "Skipping {} albums imported by previous runs".format(len(albums) - len(albums_to_search))
+                )
+
+            self.info("About to be performed:")
+
+            self.info(" * Search for {} albums".format(len(albums_to_search)))
+
+            if self.progress is not None:
+                self.progress.set_total(len(albums_to_search))
+
+            if not self.prompt_continue("Continue? (y/n) "):
+                raise ImportAborted("Import cancelled")
 
-        albums_to_add = []
         filters = []
 
         if min_tracks > 1:
@@ -272,155 +1063,288 @@ class Importer:
         # Print each album with the tracks we want from it, and maybe allow the user to confirm it
         self.info("Albums to search:")
         self.info("===========")
-        for album in albums:
-            self.info("{}".format(album))
-            self.info(" Tracks:")
-            self.info(format_unordered_list(album.tracks))
-
-            if all((f(album) for f in filters)):
-                self.success(" Will be added!")
-                albums_to_add.append(album)
-            else:
-                self.info(" Will be skipped!")
-                album.status = "Skipped"
-        self.info("===========")
+        albums_to_add = []
+        selected_albums = self._select_albums(albums_to_search, filters)
 
-        self.info("Searching musicbrainz for album IDs...")
-        for album in albums_to_add:
-            try:
-                # Note that here the returned album_id may still be `None`. We will skip those later.
-                album_id = self.headphones_find_album_id(album)
-                album.musicbrainz_id = album_id
+        if stream:
+            selected_albums = _collect(selected_albums, albums_to_add)
+        else:
+            albums_to_add.extend(selected_albums)
+            self.info("===========")
+            selected_albums = albums_to_add
+
+        misses = [] if self.fallback else None
+        if plan is not None:
+            self.info("Searching musicbrainz for album IDs to plan the import...")
+            import_stages = [
+                self._stage("plan", functools.partial(self._plan_album_stage, library=library, queue=queue), 1),
+            ]
+        else:
+            # Each album is added (and queued) as soon as its ID is found, while other albums are still being searched for
+            self.info("Searching musicbrainz for album IDs and adding them to headphones...")
+            import_stages = self._import_stages(library, queue, lossless)
+
+        with self._releasing_queue(queue and plan is None):
+            with self._phase("import"):
+                Pipeline(
+                    [self._stage("find", functools.partial(self._find_album_stage, misses=misses), self.workers)]
+                    + import_stages
+                ).run(selected_albums)
+
+            if misses:
+                self.info("Searching again for {} albums which could not be found...".format(len(misses)))
+                with self._phase("fallback"):
+                    Pipeline(
+                        [self._stage("find-fallback", self._find_album_fallback_stage, self.workers)] + import_stages
+                    ).run(misses)
+
+        albums = self.albums = list(found_albums.values())
 
-                if album_id:
-                    self.success("Mapped {album} to album ID: {album_id}".format(album=album, album_id=album_id))
-                else:
-                    self.warn("Could not find album_id for {}".format(album))
-                    album.status = "Error: Could not find album_id"
+        for album in albums:
+            # Albums which were never selected, e.g. because they never reached `min_tracks` while streaming
+            if album.status is None:
+                album.status = "Skipped"
+                self._record(album)
 
-            except requests.exceptions.RequestException as e:
-                album.status = "Error: Could not find ID: " + str(e.args)
-                self.error("Error. While searching musicbrainz for {album}: {err}".format(err=e.args, album=album))
+        if plan is not None:
+            planned = write_plan(plan, albums, self._plan_actions, queue=queue, lossless=lossless)
+            self.info("Wrote a plan to add or queue {} albums to '{}'. Run with --apply to carry it out.".format(
+                planned, plan
+            ))
 
-        for album in albums_to_add:
-            if not album.musicbrainz_id:
-                self.warn("Skipping {} due to missing album_id".format(album))
-                continue
-
-            self.info("Adding album {}...".format(album))
-            try:
-                self.headphones_add_album(album.musicbrainz_id)
-                album.status = "Added"
-                self.success("Added!")
-                if queue:
-                    self.info("Queueing album")
-                    self.headphones_queue_album(album.musicbrainz_id, lossless=lossless)
-                    album.status = "Queued"
-            except requests.exceptions.RequestException as e:
-                action = "adding"
-
-                if album.status == "Added":
-                    # This means we failed queueing
-                    action = "queueing"
-                    album.status = "Error: Not queued"
-                else:
-                    album.status = "Error: Not added"
-
-                self.error(
-                    "Error. While {action} {album} to headphones: {err}".format(
-                        err=e.args, action=action, album=album
-                    )
-                )
+        if self.progress is not None:
+            self.progress.finish()
 
         queued = sum((album.status == "Queued" for album in albums))
         added = sum((album.status == "Added" for album in albums))
         skipped = sum((album.status == "Skipped" for album in albums))
+        already_imported = sum((album.status == "Already imported" for album in albums))
+        already_present = sum((album.status == "Already present" for album in albums))
+        duplicates = sum((album.status == "Duplicate" for album in albums))
+        planned = sum((album.status == "Planned" for album in albums))
+        queue_pending = sum((album.status == "Queue pending" for album in albums))
         to_add_count = len(albums_to_add)
         total = len(albums)
 
-        summary = dict(queued=queued, added=added, skipped=skipped, to_add_count=to_add_count, total=total)
+        summary = dict(
+            queued=queued,
+            added=added,
+            skipped=skipped,
+            to_add_count=to_add_count,
+            total=total,
+            already_imported=already_imported,
+            already_present=already_present,
+            queue_pending=queue_pending,
+            duplicates=duplicates,
+            planned=planned,
+        )
+
+        if self.metrics is not None:
+            self.metrics.summary = summary
 
         self.info(
-            "Queued {queued} / Added {added} / {to_add_count} albums (skipped {skipped} / {total})"
+            "Queued {queued} (pending {queue_pending}) / Added {added} / {to_add_count} albums "
+            "(skipped {skipped}, already imported {already_imported}, already present {already_present}, "
+            "duplicates {duplicates}, planned {planned} / {total})"
             .format_map(summary)
         )
 
         for album in albums:
             status_text = "{album}: {status}".format(album=album, status=album.status)
-            if album.status == "Added":
+            if album.status in (
+                "Added", "Queued", "Queue pending", "Already imported", "Already present", "Duplicate", "Planned"
+            ):
                 self.success(status_text)
             elif album.status == "Skipped":
                 self.warn(status_text)
             else:
                 self.error(status_text)
 
-        return summary
+        return self._summarize_targets(summary)
 
-    def load_playlist_albums(self, *files, skip_errors=False) -> "list[Album]":
+    def iter_rows_albums(self, rows, min_tracks: int = 1, keep_tracks: bool = True,
+                         found_albums: Optional[dict] = None, editions: Optional[EditionIndex] = None):
+        """
+        Collects playlist rows into albums, and yields each album as soon as `min_tracks` different tracks from it have
+        been read. Tracks which appear more than once, e.g. in several playlists, are only counted once.
+        :param rows: An iterable of dicts with the columns of an Exportify CSV playlist.
+        :param min_tracks: Optional. The number of different tracks from an album which must be read before it is yielded.
+        :param keep_tracks: Optional. If `False`, only the number of tracks and their artists are kept for each album,
+                            instead of a list of every track.
+        :param found_albums: Optional. If given, every album read is stored in this dict by its album URI, including
+                             those which never reach `min_tracks`. Albums already in it are added to.
+        :param editions: Optional. If given, albums which are editions of an album already read are merged into it,
+                         instead of being stored in `found_albums` as separate albums.
+        :return: A generator of albums. Albums keep receiving tracks from later rows after they are yielded.
+        """
+        if found_albums is None:
+            found_albums = {}
+
+        # CSV FIELDS (*: used currently)
+        # Index: Name
+        # ----------------
+        #  0: "Track URI" *
+        #  1: "Track Name"  *
+        #  2: "Artist URI(s)"
+        #  3: "Artist Name(s)" *
+        #  4: "Album URI" *
+        #  5: "Album Name" *
+        #  6: "Album Artist URI(s)"
+        #  7 "Album Artist Name(s)" *
+        #  8: "Album Release Date" *
+        #  9: "Album Image URL"
+        # 10: "Disc Number"
+        # 11: "Track Number"
+        # 12: "Track Duration (ms)"
+        # 13: "Track Preview URL"
+        # 14: "Explicit"
+        # 15: "Popularity"
+        # 16: "Added By"
+        # 17: "Added At"
+
+        for row in rows:
+            album_id = row["Album URI"]
+
+            album_info = found_albums.get(album_id)
+            if album_info is None:
+                # Album fields are repeated for every track, so only the first copy is kept
+                album_info = self._get_album(
+                    found_albums,
+                    editions,
+                    album_id,
+                    row["Album Name"],
+                    row["Album Artist Name(s)"],
+                    row["Album Release Date"],
+                    keep_tracks,
+                )
+
+            track_name = row["Track Name"] if keep_tracks else None
+            track = Track(track_name, sys.intern(row["Artist Name(s)"]), uri=row.get("Track URI"))
+
+            if album_info.add_track(track) and album_info.track_count == min_tracks:
+                yield album_info
+
+    def _get_album(self, found_albums: dict, editions: Optional[EditionIndex], album_id: str, name: str, artists: str,
+                   release_date: str, keep_tracks: bool) -> Album:
+        """
+        Gets the album an album URI not in `found_albums` belongs to, i.e. an edition it was merged into before, or a
+        new album which is then stored in `found_albums`, or merged into another edition.
+        """
+        album_info = editions.get(album_id) if editions is not None else None
+        if album_info is not None:
+            return album_info
+
+        album_info = Album(name, sys.intern(artists), sys.intern(release_date), uri=album_id, keep_tracks=keep_tracks)
+        if editions is not None:
+            album_info = editions.add(album_info)
+
+        if album_info.uri == album_id:
+            found_albums[album_id] = album_info
+        else:
+            self.debug("Merged {} into another edition, {}".format(name, album_info))
+        return album_info
+
+    def iter_playlist_albums(self, *files, min_tracks: int = 1, keep_tracks: bool = True, skip_errors=False,
+                             found_albums: Optional[dict] = None, editions: Optional[EditionIndex] = None):
         """
-        Loads the CSV playlist at each path in `file` and returns a list of dicts describing albums and the desired tracks.
+        Reads the CSV playlist at each path in `files` row by row, and yields each album as soon as `min_tracks`
+        different tracks from it have been read. See `iter_rows_albums`.
         :param files: The path to a CSV playlist.
+        :param min_tracks: Optional. The number of different tracks from an album which must be read before it is yielded.
+        :param keep_tracks: Optional. If `False`, only the number of tracks and their artists are kept for each album,
+                            instead of a list of every track.
         :param skip_errors: If `True`, will continue loading files after an error in one.
-        :return: A list of album_info. Each has `artist_name`, `album_name`, `album_artist_names`, and `track_names`.
+        :param found_albums: Optional. If given, every album read is stored in this dict by its album URI, including
+                             those which never reach `min_tracks`.
+        :param editions: Optional. If given, other editions of an album are merged into it.
+        :return: A generator of albums. Albums keep receiving tracks from later rows after they are yielded.
         """
-        found_albums = {}
+        if found_albums is None:
+            found_albums = {}
 
-        for file in files:
-            self.info("Loading playlist file '{}'...".format(file))
-            try:
-                with open(file) as f:
-                    csv_reader = csv.DictReader(f)
-
-                    # CSV FIELDS (*: used currently)
-                    # Index: Name
-                    # ----------------
-                    #  0: "Track URI"
-                    #  1: "Track Name"  *
-                    #  2: "Artist URI(s)"
-                    #  3: "Artist Name(s)" *
-                    #  4: "Album URI"
-                    #  5: "Album Name" *
-                    #  6: "Album Artist URI(s)"
-                    #  7 "Album Artist Name(s)" *
-                    #  8: "Album Release Date"
-                    #  9: "Album Image URL"
-                    # 10: "Disc Number"
-                    # 11: "Track Number"
-                    # 12: "Track Duration (ms)"
-                    # 13: "Track Preview URL"
-                    # 14: "Explicit"
-                    # 15: "Popularity"
-                    # 16: "Added By"
-                    # 17: "Added At"
-
-                    for row in csv_reader:
-                        track_name = row["Track Name"]
-                        artist_name = row["Artist Name(s)"]
-
-                        album_name = row["Album Name"]
-                        album_artist_names = row["Album Artist Name(s)"]
-                        album_release_date = row["Album Release Date"]
-                        album_id = row["Album URI"]
-
-                        key = album_id #(album_artist_names, album_name)
-                        if key not in found_albums:
-                            found_albums[key] = Album(album_name, album_artist_names, album_release_date)
-
-                        album_info = found_albums[key]
-                        album_info.add_track(Track(track_name, artist_name))
-            except KeyError as e:
-                self.error("Error. Incorrectly formatted playlist in file '{}'?: {}".format(file, e.args))
-                if not skip_errors:
-                    raise
-            except IOError as e:
-                self.error("Error. Could not load playlist '{}': {}".format(file, e.args))
-                if not skip_errors:
-                    raise
-
-        total_tracks = sum((len(album_info.tracks) for album_info in found_albums.values()))
+        if self.load_workers > 1 and len(files) > 1:
+            yield from self._iter_parsed_playlist_albums(
+                files, min_tracks, keep_tracks, skip_errors, found_albums, editions
+            )
+        else:
+            for file in files:
+                self.info("Loading playlist file '{}'...".format(file))
+                try:
+                    with open(file) as f:
+                        yield from self.iter_rows_albums(
+                            csv.DictReader(f),
+                            min_tracks=min_tracks,
+                            keep_tracks=keep_tracks,
+                            found_albums=found_albums,
+                            editions=editions,
+                        )
+                except (KeyError, IOError) as e:
+                    self._playlist_error(file, e)
+                    if not skip_errors:
+                        raise
+
+        total_tracks = sum((album_info.track_count for album_info in found_albums.values()))
         self.info("Loaded {} albums for {} songs from {}".format(len(found_albums), total_tracks, files))
 
-        return list(found_albums.values())
-
+    def _iter_parsed_playlist_albums(self, files, min_tracks: int, keep_tracks: bool, skip_errors: bool,
+                                     found_albums: dict, editions: Optional[EditionIndex]):
+        """
+        Parses the playlist files in a pool of `load_workers` processes, and merges their albums in the order of
+        `files`, so the albums are the same, and in the same order, as when loading the files one at a time.
+        Only a few more files than there are processes are parsed ahead of the one being merged.
+        """
+        # By now the pipeline, HTTP and logging threads are running, and forking a process with threads can deadlock it
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(min(self.load_workers, len(files)), mp_context=context) as executor:
+            pending = collections.deque()
+            files = iter(files)
+
+            while True:
+                for file in itertools.islice(files, self.load_workers * 2 - len(pending)):
+                    pending.append((file, executor.submit(parse_playlist, file, keep_tracks)))
+                if not pending:
+                    break
+
+                file, future = pending.popleft()
+                self.info("Loading playlist file '{}'...".format(file))
+                try:
+                    parsed = future.result()
+                except (KeyError, IOError) as e:
+                    self._playlist_error(file, e)
+                    if not skip_errors:
+                        raise
+                    continue
+
+                for album_id, name, artists, release_date, tracks in parsed:
+                    album_info = found_albums.get(album_id)
+                    if album_info is None:
+                        album_info = self._get_album(
+                            found_albums, editions, album_id, name, artists, release_date, keep_tracks
+                        )
+
+                    for track_uri, track_name, track_artists in tracks:
+                        track = Track(track_name, sys.intern(track_artists), uri=track_uri)
+                        if album_info.add_track(track) and album_info.track_count == min_tracks:
+                            yield album_info
+
+    def _playlist_error(self, file, error: Exception):
+        if isinstance(error, KeyError):
+            self.error("Error. Incorrectly formatted playlist in file '{}'?: {}".format(file, error.args))
+        else:
+            self.error("Error. Could not load playlist '{}': {}".format(file, error.args))
 
-__all__ = ["Importer"]
+    def load_playlist_albums(self, *files, skip_errors=False) -> "list[Album]":
+        """
+        Loads the CSV playlist at each path in `file` and returns a list of albums with the desired tracks.
+        :param files: The path to a CSV playlist.
+        :param skip_errors: If `True`, will continue loading files after an error in one.
+        :return: A list of albums, in the order they first appear in the playlists.
+        """
+        return list(self.iter_playlist_albums(
+            *files,
+            keep_tracks=self.keep_tracks,
+            skip_errors=skip_errors,
+            editions=EditionIndex() if self.merge_editions else None,
+        ))
+
+__all__ = ["ImportAborted", "Importer", "parse_playlist"]
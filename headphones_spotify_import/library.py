@@ -0,0 +1,39 @@
+from typing import Optional
+
+# Album statuses in headphones for which adding or queueing the album again does nothing
+WANTED_STATUSES = ("Wanted", "Wanted Lossless", "Snatched", "Downloaded")
+
+
+class LibraryIndex:
+    def __init__(self):
+        """
+        An in-memory index of the albums a headphones server already tracks, by musicbrainz album ID.
+        """
+        self.albums = {}
+
+    def add(self, album_id: str, status: Optional[str]):
+        if album_id:
+            self.albums[album_id] = status
+
+    def get_status(self, album_id: str) -> Optional[str]:
+        """
+        :param album_id: The musicbrainz album ID.
+        :return: The status of the album in headphones, or `None` if headphones doesn't have it.
+        """
+        return self.albums.get(album_id)
+
+    def is_wanted(self, album_id: str) -> bool:
+        """
+        :param album_id: The musicbrainz album ID.
+        :return: `True` if headphones already has the album and is downloading or has downloaded it.
+        """
+        return self.get_status(album_id) in WANTED_STATUSES
+
+    def __contains__(self, album_id):
+        return album_id in self.albums
+
+    def __len__(self):
+        return len(self.albums)
+
+
+__all__ = ["LibraryIndex", "WANTED_STATUSES"]
@@ -0,0 +1,187 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+try:
+    # Optional since it's only needed for win32
+    import colorama
+except ImportError:
+    colorama = None
+
+LOGGER_NAME = "headphones_spotify_import"
+
+# Between INFO and WARNING, for messages about things that went well
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+
+# Color escape codes
+start = "\033[0;0m"
+error = "\033[1;31m"
+success = "\033[1;32m"
+warning = "\033[1;33m"
+
+LEVEL_COLORS = {
+    logging.DEBUG: start,
+    logging.INFO: start,
+    SUCCESS: success,
+    logging.WARNING: warning,
+    logging.ERROR: error,
+    logging.CRITICAL: error,
+}
+
+LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "success": SUCCESS,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+
+class ColorFormatter(logging.Formatter):
+    def __init__(self, color: bool = True):
+        """
+        Formats messages as they are, prefixed by the color of their level if `color` is set.
+        """
+        super().__init__("%(message)s")
+        self.color = color
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        if self.color:
+            return LEVEL_COLORS.get(record.levelno, start) + message + start
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = dict(
+            time=datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            level=record.levelname.lower(),
+            message=record.getMessage(),
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def get_logger() -> logging.Logger:
+    return logging.getLogger(LOGGER_NAME)
+
+
+def configure_logging(level: int = logging.INFO, fmt: str = "text", color: bool = True, stream=None,
+                      buffered: bool = True) -> Optional[QueueListener]:
+    """
+    Sends the importer's log messages to `stream`, replacing any handlers set up before.
+    :param level: Optional. The minimum level of messages to output.
+    :param fmt: Optional. `text` for plain (optionally colored) lines, or `json` for one JSON object per line.
+    :param color: Optional. Whether to color text lines.
+    :param stream: Optional. The stream to write to. Defaults to stdout.
+    :param buffered: Optional. If `True`, messages are written by a background thread, so logging never waits for
+                     the console. Should be `False` when prompting for input, so prompts appear after the messages
+                     before them.
+    :return: The listener writing buffered messages, or `None` if not buffered. It is stopped, flushing any messages
+             still waiting, when the interpreter exits.
+    """
+    stream = stream or sys.stdout
+
+    if color and fmt == "text" and colorama:
+        colorama.init()
+
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else ColorFormatter(color))
+
+    logger = get_logger()
+    for old_handler in list(logger.handlers):
+        logger.removeHandler(old_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    if not buffered:
+        logger.addHandler(handler)
+        return None
+
+    messages = queue.Queue()
+    listener = QueueListener(messages, handler)
+    logger.addHandler(QueueHandler(messages))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class Progress:
+    def __init__(self, stream=None, interval: Optional[float] = None):
+        """
+        Shows how many albums have been processed, as a single updating line on a terminal, or as a line every
+        `interval` seconds otherwise. Safe to share between threads.
+        :param stream: Optional. The stream to write to. Defaults to stderr.
+        :param interval: Optional. The minimum number of seconds between updates. Defaults to half a second on a
+                         terminal and 30 seconds otherwise.
+        """
+        self.stream = stream or sys.stderr
+        self.tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.interval = interval if interval is not None else (0.5 if self.tty else 30)
+        self.total = None
+        self.statuses = {}
+        # Anything else to show, e.g. the current request rates, by label. Values are formatted with `str`.
+        self.gauges = {}
+        self._last_render = 0.0
+        self._lock = threading.Lock()
+
+    def set_total(self, total: Optional[int]):
+        with self._lock:
+            self.total = total
+
+    def update(self, key, status: str):
+        """
+        Records the latest status of an album, and redraws the progress if it's been long enough.
+        :param key: Identifies the album.
+        :param status: The album's status.
+        """
+        with self._lock:
+            self.statuses[key] = status
+
+            now = time.monotonic()
+            if now - self._last_render >= self.interval:
+                self._last_render = now
+                self._render()
+
+    def finish(self):
+        with self._lock:
+            self._render()
+            if self.tty:
+                self.stream.write("\n")
+                self.stream.flush()
+
+    def format(self) -> str:
+        counts = Counter(self.statuses.values())
+        errors = sum(count for status, count in counts.items() if status and status.startswith("Error"))
+        parts = ["{} albums".format(
+            "{}/{}".format(len(self.statuses), self.total) if self.total else len(self.statuses)
+        )]
+        for status in ("Added", "Queued", "Queue pending", "Planned", "Already present", "Duplicate", "Skipped"):
+            if counts[status]:
+                parts.append("{} {}".format(status.lower(), counts[status]))
+        parts.append("errors {}".format(errors))
+        for label, value in self.gauges.items():
+            parts.append("{} {}".format(label, value))
+        return ", ".join(parts)
+
+    def _render(self):
+        text = self.format()
+        if self.tty:
+            self.stream.write("\r\033[K" + text)
+        else:
+            self.stream.write(text + "\n")
+        self.stream.flush()
+
+
+__all__ = ["configure_logging", "get_logger", "JsonFormatter", "LEVELS", "Progress", "SUCCESS"]
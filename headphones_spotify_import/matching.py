@@ -0,0 +1,252 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Optional
+
+from .album import Album
+
+# Punctuation and whitespace, in any script
+_NOT_ALPHANUMERIC = re.compile(r"[\W_]+")
+
+# "Version" only marks an edition with wording like this, since e.g. "Fearless (Taylor's Version)" is a re-recording
+_EDITION_VERSION = (
+    r"(?:album|original|explicit|clean|deluxe|extended|expanded|mono|stereo|international|us|uk|japan(?:ese)?)"
+    r"\s+version"
+)
+
+# Parenthesized or dashed suffixes that mark a particular edition of an album rather than a different album, e.g.
+# "Abbey Road (Remastered 2009)", "Rumours [Deluxe Edition]" or "Nevermind - 20th Anniversary Edition"
+_EDITION_SUFFIX = re.compile(
+    r"\s*(?:[(\[][^)\]]*\b(?:remaster\w*|deluxe|edition|" + _EDITION_VERSION + r"|expanded|anniversary|explicit|clean"
+    r"|bonus|mono|stereo|reissue|special|collector'?s?)\b[^)\]]*[)\]]"
+    r"|\s-\s.*\b(?:remaster\w*|deluxe|edition|" + _EDITION_VERSION + r"|anniversary|reissue)\b.*)$",
+    re.IGNORECASE
+)
+
+DEFAULT_THRESHOLD = 0.75
+
+# How much each part of the score counts towards the total. These add up to 1.
+DEFAULT_WEIGHTS = dict(title=0.45, artist=0.3, year=0.1, tracks=0.05, score=0.1)
+
+
+def normalize(value: str) -> str:
+    """
+    Normalizes a name for comparison, by removing accents, punctuation, case and extra whitespace. Letters of every
+    script are kept, e.g. "Кино" normalizes to "кино".
+    """
+    value = "".join(char for char in unicodedata.normalize("NFKD", value) if not unicodedata.combining(char))
+    return _NOT_ALPHANUMERIC.sub(" ", unicodedata.normalize("NFC", value).casefold()).strip()
+
+
+def strip_edition(title: str) -> str:
+    """
+    Removes any suffixes naming a particular edition of the album, e.g. "(Remastered)" or "- Deluxe Edition".
+    """
+    while True:
+        stripped = _EDITION_SUFFIX.sub("", title)
+        if stripped == title or not stripped:
+            return title
+        title = stripped
+
+
+def split_artists(artists: str) -> "list[str]":
+    return [artist for artist in (normalize(artist) for artist in artists.split(",")) if artist]
+
+
+def similarity(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _year(value) -> Optional[int]:
+    try:
+        return int(str(value)[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+class AlbumQuery:
+    def __init__(self, album: Album):
+        """
+        The normalized fields of an album which search results are compared against, computed only once per album.
+        :param album: The album being searched for.
+        """
+        self.album = album
+        self.title = normalize(album.name)
+        self.base_title = normalize(strip_edition(album.name))
+        self.artists = set(split_artists(album.artists))
+        self.track_artists = {artist for artists in album.track_artists for artist in split_artists(artists)}
+        self.all_artists = self.artists | self.track_artists
+        self.track_count = album.track_count
+        self.year = _year(album.release_year)
+
+
+class AlbumMatcher:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, weights: Optional[dict] = None):
+        """
+        Scores the results of a headphones `findAlbum` search against the album being searched for.
+        :param threshold: Optional. The minimum score, from 0 to 1, of a result to be accepted.
+        :param weights: Optional. How much each of `title`, `artist`, `year`, `tracks` and `score` counts towards
+                        the total score. Defaults to `DEFAULT_WEIGHTS`.
+        """
+        self.threshold = threshold
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+
+    def score(self, query: AlbumQuery, match: dict) -> "tuple[float, dict]":
+        """
+        Scores a single search result.
+        :param query: The album being searched for.
+        :param match: A search result, as returned by `findAlbum`.
+        :return: A tuple of the total score and a dict of the score of each part, all from 0 to 1.
+        """
+        match_title = normalize(match.get("title") or "")
+        match_artist = normalize(match.get("uniquename") or "")
+
+        if match_title == query.title or (query.title and match_title.startswith(query.title)):
+            title_score = 1.0
+        else:
+            title_score = max(
+                similarity(query.title, match_title),
+                similarity(query.base_title, normalize(strip_edition(match.get("title") or ""))),
+            )
+
+        if match_artist in query.all_artists:
+            artist_score = 1.0
+        else:
+            artist_score = max((similarity(match_artist, artist) for artist in query.all_artists), default=0.0)
+
+        match_year = _year(match.get("date"))
+        if query.year is None or match_year is None:
+            year_score = 0.5
+        else:
+            year_score = max(0.0, 1.0 - abs(query.year - match_year) / 2)
+
+        try:
+            # The playlists may only include some of the album's tracks, so only too few tracks counts against it
+            match_tracks = int(match.get("tracks"))
+            tracks_score = min(1.0, match_tracks / query.track_count) if query.track_count else 0.5
+        except (TypeError, ValueError):
+            tracks_score = 0.5
+
+        try:
+            headphones_score = min(1.0, max(0.0, float(match.get("score")) / 100))
+        except (TypeError, ValueError):
+            headphones_score = 0.5
+
+        scores = dict(
+            title=title_score, artist=artist_score, year=year_score, tracks=tracks_score, score=headphones_score
+        )
+        total = sum(self.weights[name] * value for name, value in scores.items())
+
+        return total, scores
+
+    def rank(self, album: Album, matches: "list[dict]") -> "list[tuple[float, dict, dict]]":
+        """
+        Scores every search result.
+        :param album: The album being searched for.
+        :param matches: The search results, as returned by `findAlbum`.
+        :return: A list of `(total, scores, match)` tuples, best first.
+        """
+        query = AlbumQuery(album)
+        ranked = [self.score(query, match) + (match,) for match in matches]
+        ranked.sort(key=lambda scored: scored[0], reverse=True)
+        return ranked
+
+    def best_match(self, ranked: "list[tuple[float, dict, dict]]") -> Optional[dict]:
+        """
+        :param ranked: Scored search results, as returned by `rank`.
+        :return: The best search result, or `None` if none scored at least `threshold`.
+        """
+        if ranked and ranked[0][0] >= self.threshold:
+            return ranked[0][2]
+        return None
+
+
+class EditionIndex:
+    def __init__(self):
+        """
+        Finds albums which are other editions of an album already read, e.g. the explicit and clean versions, regional
+        releases or a deluxe edition, so they can be merged into one album and searched for only once. Editions are
+        albums by the same artists, with the same title once any edition suffix is removed. Albums with exactly the
+        same title must also come from the same year, since artists sometimes reuse a title, e.g. for self-titled
+        albums.
+        """
+        self._groups = {}
+        self._albums = {}
+
+    def get(self, uri: str) -> Optional[Album]:
+        """
+        :return: The album that the album with this URI was merged into, if it was.
+        """
+        return self._albums.get(uri)
+
+    def add(self, album: Album) -> Album:
+        """
+        Adds an album, merging it into an edition of it that was added before, if there is one.
+        :param album: A new album, without any tracks yet.
+        :return: The album it was merged into, or `album` itself.
+        """
+        base_title = strip_edition(album.name)
+        key = (normalize(base_title), tuple(sorted(split_artists(album.artists))))
+        if not key[0] or not key[1]:
+            return album
+
+        group = self._groups.setdefault(key, [])
+        for edition in group:
+            if (
+                _year(edition.release_year) == _year(album.release_year)
+                or base_title != album.name
+                or strip_edition(edition.name) != edition.name
+            ):
+                edition.edition_uris += (album.uri,)
+                self._albums[album.uri] = edition
+                return edition
+
+        group.append(album)
+        return album
+
+
+def fallback_queries(album: Album) -> "list[str]":
+    """
+    Builds progressively more relaxed search queries for an album that could not be found with its full name.
+    :param album: The album.
+    :return: A list of queries, most specific first. Doesn't include the album's original query.
+    """
+    base_title = strip_edition(album.name)
+    primary_artist = album.artists.split(",")[0].strip()
+
+    queries = [
+        "{} - {}".format(album.artists, album.name),
+        "{} - {}".format(album.artists, base_title),
+        "{} - {}".format(primary_artist, base_title),
+        base_title,
+        album.name,
+    ]
+
+    seen = {str(album)}
+    unique_queries = []
+    for query in queries:
+        if query and query not in seen:
+            seen.add(query)
+            unique_queries.append(query)
+
+    return unique_queries
+
+
+def format_scores(total: float, scores: dict, match: dict) -> str:
+    return "{artist} - {title} ({date}): {total:.2f} ({parts})".format(
+        artist=match.get("uniquename"),
+        title=match.get("title"),
+        date=match.get("date"),
+        total=total,
+        parts=", ".join("{}={:.2f}".format(name, value) for name, value in scores.items()),
+    )
+
+
+__all__ = [
+    "AlbumMatcher", "AlbumQuery", "DEFAULT_THRESHOLD", "EditionIndex", "fallback_queries", "format_scores", "normalize",
+    "strip_edition",
+]
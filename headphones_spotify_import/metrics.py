@@ -0,0 +1,218 @@
+import contextlib
+import csv
+import heapq
+import json
+import threading
+import time
+from collections import defaultdict
+from os import PathLike
+from typing import Optional
+
+# Upper bounds of the request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _percentile(values: "list[float]", fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class RequestStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.latencies = []
+
+    def to_dict(self) -> dict:
+        return dict(
+            count=self.count,
+            errors=self.errors,
+            retries=self.retries,
+            bytes=self.bytes,
+            seconds=sum(self.latencies),
+            p50=_percentile(self.latencies, 0.5),
+            p95=_percentile(self.latencies, 0.95),
+            max=max(self.latencies, default=None),
+            buckets={str(bound): sum(1 for latency in self.latencies if latency <= bound) for bound in LATENCY_BUCKETS},
+        )
+
+
+class Metrics:
+    def __init__(self, slowest: int = 10):
+        """
+        Collects timings of an import: the wall time of each phase, the time spent in each pipeline stage, the latency
+        of each headphones API request by command, and the albums whose requests took longest. Safe to share between
+        threads.
+        :param slowest: Optional. How many of the slowest albums to report.
+        """
+        self.slowest = slowest
+        self.phases = defaultdict(float)
+        self.stages = defaultdict(lambda: dict(count=0, seconds=0.0))
+        self.requests = defaultdict(RequestStats)
+        self.album_seconds = defaultdict(float)
+        self.summary = None
+        self.targets = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Adds the wall time of the `with` block to the phase `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase_time(name, time.perf_counter() - start)
+
+    def add_phase_time(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] += seconds
+
+    def timed_iter(self, name: str, items):
+        """
+        Passes through every item of `items`, adding the time spent producing them to the phase `name`.
+        """
+        iterator = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_phase_time(name, time.perf_counter() - start)
+                return
+            self.add_phase_time(name, time.perf_counter() - start)
+            yield item
+
+    @contextlib.contextmanager
+    def stage(self, name: str, album):
+        """
+        Adds the time of the `with` block to the pipeline stage `name`. Requests made by this thread inside the block
+        are counted towards `album`.
+        """
+        self._local.album = str(album)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._local.album = None
+            with self._lock:
+                self.stages[name]["count"] += 1
+                self.stages[name]["seconds"] += seconds
+
+    def record_request(self, cmd: str, seconds: float, size: int = 0, retries: int = 0, error: bool = False):
+        """
+        Records a single headphones API request.
+        :param cmd: The API command.
+        :param seconds: How long the request took, including retries.
+        :param size: Optional. The size of the response body in bytes.
+        :param retries: Optional. How many times the request was retried.
+        :param error: Optional. `True` if the request failed.
+        """
+        album = getattr(self._local, "album", None)
+
+        with self._lock:
+            stats = self.requests[cmd]
+            stats.count += 1
+            stats.errors += int(error)
+            stats.retries += retries
+            stats.bytes += size
+            stats.latencies.append(seconds)
+
+            if album:
+                self.album_seconds[album] += seconds
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            slowest = heapq.nlargest(self.slowest, self.album_seconds.items(), key=lambda item: item[1])
+            return dict(
+                phases=dict(self.phases),
+                stages={name: dict(stage) for name, stage in self.stages.items()},
+                requests={cmd: stats.to_dict() for cmd, stats in self.requests.items()},
+                slowest_albums=[dict(album=album, seconds=seconds) for album, seconds in slowest],
+                summary=self.summary,
+                targets=self.targets,
+            )
+
+    def write_report(self, path: "PathLike | str"):
+        """
+        Writes a report of all metrics. Paths ending in `.csv` get a CSV file of `metric,label,value` rows, and any
+        other path gets a JSON file.
+        """
+        report = self.to_dict()
+
+        if str(path).lower().endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["metric", "label", "value"])
+                for name, seconds in report["phases"].items():
+                    writer.writerow(["phase_seconds", name, seconds])
+                for name, stage in report["stages"].items():
+                    writer.writerow(["stage_count", name, stage["count"]])
+                    writer.writerow(["stage_seconds", name, stage["seconds"]])
+                for cmd, stats in report["requests"].items():
+                    for key in ("count", "errors", "retries", "bytes", "seconds", "p50", "p95", "max"):
+                        writer.writerow(["request_" + key, cmd, stats[key]])
+                for album in report["slowest_albums"]:
+                    writer.writerow(["slowest_album_seconds", album["album"], album["seconds"]])
+                for key, value in (report["summary"] or {}).items():
+                    writer.writerow(["summary", key, value])
+                for name, target in (report["targets"] or {}).items():
+                    for key, value in target.items():
+                        writer.writerow(["target_" + key, name, value])
+        else:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    def write_prometheus(self, path: "PathLike | str"):
+        """
+        Writes the metrics in the Prometheus text format, e.g. for the node exporter's textfile collector.
+        """
+        report = self.to_dict()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP headphones_import_{} {}".format(name, help_text))
+            lines.append("# TYPE headphones_import_{} {}".format(name, kind))
+            for labels, value in samples:
+                label_text = ",".join('{}="{}"'.format(key, str(label).replace('"', '\\"')) for key, label in labels)
+                lines.append("headphones_import_{}{} {}".format(name, "{" + label_text + "}" if labels else "", value))
+
+        metric("phase_seconds", "gauge", "Wall time of each phase of the import.",
+               [((("phase", name),), seconds) for name, seconds in report["phases"].items()])
+        metric("stage_seconds", "gauge", "Time spent by all workers of each pipeline stage.",
+               [((("stage", name),), stage["seconds"]) for name, stage in report["stages"].items()])
+
+        lines.append("# HELP headphones_import_request_duration_seconds Latency of headphones API requests.")
+        lines.append("# TYPE headphones_import_request_duration_seconds histogram")
+        for cmd, stats in report["requests"].items():
+            for bound, count in list(stats["buckets"].items()) + [("+Inf", stats["count"])]:
+                lines.append('headphones_import_request_duration_seconds_bucket{{cmd="{}",le="{}"}} {}'.format(
+                    cmd, bound, count
+                ))
+            lines.append('headphones_import_request_duration_seconds_sum{{cmd="{}"}} {}'.format(cmd, stats["seconds"]))
+            lines.append('headphones_import_request_duration_seconds_count{{cmd="{}"}} {}'.format(cmd, stats["count"]))
+
+        metric("request_errors_total", "counter", "Failed headphones API requests.",
+               [((("cmd", cmd),), stats["errors"]) for cmd, stats in report["requests"].items()])
+        metric("request_retries_total", "counter", "Retried headphones API requests.",
+               [((("cmd", cmd),), stats["retries"]) for cmd, stats in report["requests"].items()])
+        metric("response_bytes_total", "counter", "Bytes received from the headphones API.",
+               [((("cmd", cmd),), stats["bytes"]) for cmd, stats in report["requests"].items()])
+        metric("albums", "gauge", "Albums by outcome of the import.",
+               [((("outcome", key),), value) for key, value in (report["summary"] or {}).items()])
+        metric("target_albums", "gauge", "Albums by outcome on each of the other headphones servers.",
+               [((("target", name), ("outcome", key)), value)
+                for name, target in (report["targets"] or {}).items() for key, value in target.items()])
+
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+__all__ = ["Metrics"]
@@ -0,0 +1,111 @@
+import queue
+import threading
+from typing import Callable, Iterable, Optional
+
+# Sent down a stage's queue once no more items will arrive
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[object], bool], workers: int = 1):
+        """
+        A step of a pipeline, run by its own pool of worker threads.
+        :param name: The name of the stage, used to name its threads.
+        :param fn: Processes a single item. Returns `True` if the item should be passed on to the next stage.
+        :param workers: Optional. How many items the stage may process at the same time.
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+
+class Pipeline:
+    def __init__(self, stages: "list[Stage]", buffer_size: Optional[int] = None):
+        """
+        Passes items through a series of stages, each running concurrently with the others, so an item can reach the
+        last stage while later items are still in the first. Stages are connected by bounded queues, so a slow stage
+        holds back the ones before it instead of letting work pile up.
+        :param stages: The stages, in order.
+        :param buffer_size: Optional. The number of items which may wait in front of each stage. Defaults to twice
+                            the stage's number of workers.
+        """
+        self.stages = stages
+        self.buffer_size = buffer_size
+        self._error = None
+        self._error_lock = threading.Lock()
+
+    def run(self, items: Iterable):
+        """
+        Feeds `items` through the pipeline and waits for every stage to finish. Items are read from `items` as the first
+        stage has room for them, so `items` may be a generator which is still producing items.
+        If a stage raises an exception, no more items are processed and the exception is re-raised here. If `items`
+        raises, the items read before it are still processed before its exception is re-raised.
+        :param items: The items to process.
+        """
+        queues = [queue.Queue(maxsize=self.buffer_size or stage.workers * 2) for stage in self.stages]
+        threads = []
+
+        for index, stage in enumerate(self.stages):
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            remaining = [stage.workers]
+            remaining_lock = threading.Lock()
+
+            for number in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(stage, inbox, outbox, remaining, remaining_lock),
+                    name="{}-{}".format(stage.name, number),
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        try:
+            for item in items:
+                if self._error is not None:
+                    break
+                queues[0].put(item)
+        finally:
+            # Even if `items` raises, the workers have to be told to stop, or they would wait for more items forever
+            queues[0].put(_DONE)
+
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def _work(self, stage: Stage, inbox: queue.Queue, outbox: Optional[queue.Queue], remaining: list,
+              remaining_lock: threading.Lock):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                # Let the other workers of this stage see it too
+                inbox.put(_DONE)
+                break
+
+            if self._error is not None:
+                # Something went wrong, so just drain the queue
+                continue
+
+            try:
+                passed = stage.fn(item)
+            except Exception as e:
+                with self._error_lock:
+                    if self._error is None:
+                        self._error = e
+                continue
+
+            if passed and outbox is not None:
+                outbox.put(item)
+
+        with remaining_lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+
+        if last and outbox is not None:
+            outbox.put(_DONE)
+
+
+__all__ = ["Pipeline", "Stage"]
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from os import PathLike
+
+from .album import Album
+
+# The statuses an album can end up with when its plan entry has been carried out, depending on whether it's queued
+APPLIED_STATUSES = ("Added",)
+APPLIED_QUEUE_STATUSES = ("Queued", "Queue pending")
+
+
+def write_plan(path: "PathLike | str", albums: "list[Album]", actions: dict, queue: bool, lossless: bool) -> int:
+    """
+    Writes the plan of an import: a header line, then one line per album with its album ID and what will be done with
+    it. Albums which won't be added or queued are included too, with their status, so the plan can be reviewed.
+    To leave an album out, set its `add` and `queue` to `false`.
+    :param path: The path of the plan file. It's replaced if it exists.
+    :param albums: Every album of the import.
+    :param actions: The `(add, queue)` planned for each album which was found, by album URI.
+    :param queue: Whether albums are queued after they're added.
+    :param lossless: Whether to only search for lossless versions when queueing.
+    :return: The number of albums to add or queue.
+    """
+    directory = os.path.dirname(os.fspath(path))
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    planned = 0
+    tmp_path = "{}.tmp".format(os.fspath(path))
+    with open(tmp_path, "w") as f:
+        f.write(json.dumps(dict(plan=1, created_at=time.time(), queue=queue, lossless=lossless)) + "\n")
+
+        for album in albums:
+            add, queue_album = actions.get(album.uri, (False, False))
+            planned += add or queue_album
+            f.write(json.dumps(dict(
+                uri=album.uri,
+                name=album.name,
+                artists=album.artists,
+                release_date=album.release_date,
+                musicbrainz_id=album.musicbrainz_id,
+                add=add,
+                queue=queue_album,
+                status=album.status,
+            )) + "\n")
+    os.replace(tmp_path, path)
+
+    return planned
+
+
+class ImportPlan:
+    def __init__(self, path: "PathLike | str"):
+        """
+        A plan written by `write_plan`, to carry out with `Importer.apply_plan`. Each album is marked as done in the
+        plan file as soon as it has been added and queued, on the main server and on every server in `targets`, so
+        applying the plan again only carries out what's left. Safe to share between threads.
+        :param path: The path of the plan file.
+        """
+        self.path = path
+        self.entries = {}
+        self.done = set()
+        # The other servers every album has to reach before it's done, the status of each album which is done on the
+        # main server, and the other servers which already have each album, by URI
+        self.targets = set()
+        self.applied = {}
+        self.target_done = {}
+        self._lock = threading.Lock()
+
+        with open(path) as f:
+            header = json.loads(f.readline())
+            if header.get("plan") != 1:
+                raise ValueError("'{}' is not an import plan".format(path))
+
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A partially written line from an interrupted run
+                    continue
+
+                if entry.get("done"):
+                    self.done.add(entry["uri"])
+                elif entry.get("applied"):
+                    self.applied[entry["uri"]] = entry["status"]
+                elif "target" in entry:
+                    self.target_done.setdefault(entry["uri"], set()).add(entry["target"])
+                else:
+                    self.entries[entry["uri"]] = entry
+
+        self.queue = header["queue"]
+        self.lossless = header["lossless"]
+        self._file = open(path, "a")
+
+    def pending(self) -> "list[dict]":
+        """
+        :return: The entries of the albums which still have to be added or queued, in plan order.
+        """
+        return [
+            entry for uri, entry in self.entries.items()
+            if (entry["add"] or entry["queue"]) and entry["musicbrainz_id"] and uri not in self.done
+        ]
+
+    def album(self, entry: dict) -> Album:
+        album = Album(entry["name"], entry["artists"], entry["release_date"], uri=entry["uri"], keep_tracks=False)
+        album.musicbrainz_id = entry["musicbrainz_id"]
+        return album
+
+    def record(self, album: Album):
+        """
+        Marks an album as done on the main server once it has the status its entry was planned to end with, and as
+        done once every other server has it too.
+        """
+        entry = self.entries.get(album.uri)
+        if entry is None:
+            return
+
+        if album.status not in (APPLIED_QUEUE_STATUSES if entry["queue"] else APPLIED_STATUSES):
+            return
+
+        with self._lock:
+            if album.uri in self.applied or album.uri in self.done:
+                return
+
+            self.applied[album.uri] = album.status
+            self._write(dict(uri=album.uri, applied=True, status=album.status))
+            self._finish(album.uri)
+
+    def record_target(self, album: Album, target: str, status: str, done: bool):
+        """
+        Records that another server has an album, once it does, and marks the album as done once every server has it.
+        :param album: The album.
+        :param target: The name of the server.
+        :param status: The album's status on that server.
+        :param done: Whether the server has the album as planned.
+        """
+        if album.uri not in self.entries or not done:
+            return
+
+        with self._lock:
+            if target in self.target_done.get(album.uri, ()) or album.uri in self.done:
+                return
+
+            self.target_done.setdefault(album.uri, set()).add(target)
+            self._write(dict(uri=album.uri, target=target, status=status))
+            self._finish(album.uri)
+
+    def _finish(self, uri: str):
+        if uri in self.applied and self.targets <= self.target_done.get(uri, set()):
+            self.done.add(uri)
+            self._write(dict(uri=uri, done=True, status=self.applied[uri]))
+
+    def _write(self, line: dict):
+        self._file.write(json.dumps(line) + "\n")
+        self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+__all__ = ["ImportPlan", "write_plan"]
@@ -0,0 +1,163 @@
+import threading
+import time
+from typing import Optional
+
+from .log import get_logger
+
+
+class RateLimiter:
+    def __init__(self, rate: Optional[float] = None):
+        """
+        Limits how often requests may be made to a server. Safe to share between threads.
+        :param rate: The maximum number of requests per second. If `None` or `0`, requests are not limited.
+        """
+        self.rate = rate
+        self._interval = 1.0 / rate if rate else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the next request is allowed to be made.
+        """
+        if not self._interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class AdaptiveLimiter:
+    def __init__(self, max_rate: Optional[float] = None, max_concurrency: Optional[int] = None, adaptive: bool = True,
+                 initial_rate: float = 1.0, min_rate: float = 0.1, increase: float = 1.0, decrease: float = 0.5,
+                 latency_target: Optional[float] = None, name: str = "requests"):
+        """
+        Limits the rate and the number of concurrent requests for a kind of request, e.g. searches. Adaptive limits
+        start low and are adjusted after every request, AIMD-style: they grow a little after every request that went
+        well, and are cut by `decrease` as soon as the server shows it's overloaded, i.e. a request timed out, failed
+        with a 429 or a 5xx gateway error (even if a retry then succeeded), or took much longer than usual. Until the
+        server is first overloaded, they grow much faster, doubling about every second.
+        Safe to share between threads.
+        :param max_rate: Optional. The maximum number of requests per second. Without `adaptive`, the fixed rate.
+        :param max_concurrency: Optional. The maximum number of requests at the same time.
+        :param adaptive: If `False`, the limits are fixed at `max_rate` and `max_concurrency`.
+        :param initial_rate: Optional. The rate to start at, in requests per second.
+        :param min_rate: Optional. The lowest the rate is cut to.
+        :param increase: Optional. How much the rate grows per second of requests that went well, in requests per
+                         second. The concurrency grows by one for every round of requests that went well.
+        :param decrease: Optional. The factor the rate and concurrency are multiplied by when the server is overloaded.
+        :param latency_target: Optional. Requests taking longer than this many seconds count as a sign of overload.
+                               Defaults to four times the lowest typical latency seen so far.
+        :param name: Optional. What is being limited, for messages.
+        """
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.adaptive = adaptive
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.name = name
+
+        if adaptive:
+            self.rate = min(initial_rate, max_rate) if max_rate else initial_rate
+            self.concurrency = 1.0
+        else:
+            self.rate = max_rate
+            self.concurrency = max_concurrency
+
+        self._in_flight = 0
+        self._next_slot = 0.0
+        self._hold_until = 0.0
+        self._latency = None
+        self._baseline = None
+        self._samples = 0
+        self._slow_start = adaptive
+        # How many requests were held back by each limit since the limits were last adjusted, and how many are waiting
+        # for a free slot right now, so limits are only raised when they're actually holding requests back
+        self._rate_waits = 0
+        self._concurrency_waits = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """
+        Blocks until another request is allowed to start. Every call must be followed by a call to `release`.
+        """
+        with self._cond:
+            if self.concurrency and self._in_flight >= int(self.concurrency):
+                self._concurrency_waits += 1
+                self._waiting += 1
+                while self.concurrency and self._in_flight >= int(self.concurrency):
+                    self._cond.wait()
+                self._waiting -= 1
+            self._in_flight += 1
+
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + (1.0 / self.rate if self.rate else 0.0)
+            if slot > now:
+                self._rate_waits += 1
+
+        if slot > now:
+            time.sleep(slot - now)
+
+    def release(self, seconds: float, overloaded: bool = False):
+        """
+        Records that a request finished, and adjusts the limits.
+        :param seconds: How long the request took.
+        :param overloaded: Whether the request failed in a way that shows the server is overloaded.
+        """
+        with self._cond:
+            self._in_flight -= 1
+            if self.adaptive:
+                self._adjust(seconds, overloaded)
+            self._cond.notify_all()
+
+    def _adjust(self, seconds: float, overloaded: bool):
+        if not overloaded:
+            # The lowest smoothed latency is what a request takes when the server isn't busy
+            self._latency = seconds if self._latency is None else 0.8 * self._latency + 0.2 * seconds
+            self._samples += 1
+            if self._samples >= 5:
+                self._baseline = min(self._baseline or self._latency, self._latency)
+
+            target = self.latency_target or (4 * self._baseline if self._baseline else None)
+            overloaded = target is not None and seconds > target
+
+        now = time.monotonic()
+        if overloaded:
+            # Requests which were already running when the limits were cut don't cut them again
+            if now >= self._hold_until:
+                self._slow_start = False
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.concurrency = max(1.0, self.concurrency * self.decrease)
+                self._hold_until = now + max(seconds, 1.0)
+                get_logger().debug("Headphones is overloaded, slowing {} down to {}".format(self.name, self))
+        else:
+            # Limits which aren't holding requests back aren't raised, so they stay close to what's actually used
+            if self._rate_waits:
+                self.rate += self.increase if self._slow_start else self.increase / self.rate
+                if self.max_rate:
+                    self.rate = min(self.rate, self.max_rate)
+            if self._concurrency_waits or self._waiting:
+                self.concurrency += 1.0 if self._slow_start else 1.0 / self.concurrency
+                if self.max_concurrency:
+                    self.concurrency = min(self.concurrency, float(self.max_concurrency))
+
+        self._rate_waits = 0
+        self._concurrency_waits = 0
+
+    def __str__(self):
+        rate = "{:.1f}/s".format(self.rate) if self.rate else "unlimited"
+        if self.concurrency:
+            return "{} x{}".format(rate, int(self.concurrency))
+        return rate
+
+
+__all__ = ["AdaptiveLimiter", "RateLimiter"]
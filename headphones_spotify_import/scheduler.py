@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+from os import PathLike
+from typing import Callable, Iterable, Optional
+
+import requests
+
+# How many times a queue request is attempted before the album is dropped from the queue
+MAX_ATTEMPTS = 3
+
+
+def parse_window(value: str) -> "tuple[dt_time, dt_time]":
+    """
+    Parses a daily time window of the form `HH:MM-HH:MM`, e.g. `01:00-06:00`. The window may wrap past midnight.
+    """
+    try:
+        start, end = value.split("-")
+        return (
+            datetime.strptime(start.strip(), "%H:%M").time(),
+            datetime.strptime(end.strip(), "%H:%M").time(),
+        )
+    except ValueError:
+        raise ValueError("Invalid time window '{}', expected HH:MM-HH:MM".format(value))
+
+
+def seconds_until_window(window: "tuple[dt_time, dt_time]", now: Optional[datetime] = None) -> float:
+    """
+    :param window: The daily time window, as returned by `parse_window`.
+    :param now: Optional. The current time. Defaults to now.
+    :return: `0` if `now` is inside the window, otherwise the number of seconds until it next opens.
+    """
+    now = now or datetime.now()
+    start, end = window
+    current = now.time()
+
+    if start <= end:
+        inside = start <= current < end
+    else:
+        inside = current >= start or current < end
+
+    if inside:
+        return 0
+
+    opens = now.replace(hour=start.hour, minute=start.minute, second=0, microsecond=0)
+    if opens <= now:
+        opens += timedelta(days=1)
+    return (opens - now).total_seconds()
+
+
+class QueueScheduler:
+    def __init__(self, path: "PathLike | str", rate: Optional[float] = None, batch_size: int = 1,
+                 batch_interval: float = 0, window: Optional[str] = None):
+        """
+        Holds back `queueAlbum` requests, so headphones isn't asked to search for thousands of albums at once, and
+        releases them at a limited rate, in batches, or only during a daily time window. Pending requests are saved to
+        a file as soon as they're submitted, so whatever isn't released by the end of an import can be released later.
+        Safe to share between threads.
+        :param path: The path of the pending queue file. It will be created if it does not exist.
+        :param rate: Optional. The maximum number of albums to queue per minute.
+        :param batch_size: Optional. How many albums to queue at a time.
+        :param batch_interval: Optional. How many seconds to wait between batches.
+        :param window: Optional. A daily time window of the form `HH:MM-HH:MM` outside of which nothing is queued.
+        """
+        self.path = path
+        self.rate = rate
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self.window = parse_window(window) if window else None
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A partially written line from an interrupted run
+                        continue
+
+                    if entry.pop("done", False):
+                        self.pending.pop(entry["id"], None)
+                    else:
+                        self.pending[entry["id"]] = entry
+        except FileNotFoundError:
+            pass
+
+        directory = os.path.dirname(os.fspath(self.path))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Rewrite the file with only what's still pending
+        tmp_path = "{}.tmp".format(os.fspath(self.path))
+        with open(tmp_path, "w") as f:
+            for entry in self.pending.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+
+        self._file = open(self.path, "a")
+
+    def _write(self, entry: dict):
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def submit(self, album_id: str, lossless: bool, name: Optional[str] = None, uris: "Iterable[str]" = ()):
+        """
+        Adds an album to the pending queue.
+        :param album_id: The musicbrainz album ID.
+        :param lossless: Whether to only search for lossless versions.
+        :param name: Optional. The name of the album, for messages.
+        :param uris: Optional. The spotify URIs of the album, so its outcome can be recorded once it's released, even
+                     by a later run.
+        """
+        entry = dict(id=album_id, lossless=lossless, name=name, attempts=0, uris=list(uris))
+        with self._lock:
+            self.pending[album_id] = entry
+            self._write(entry)
+
+    def __len__(self):
+        with self._lock:
+            return len(self.pending)
+
+    def __contains__(self, album_id: str) -> bool:
+        with self._lock:
+            return album_id in self.pending
+
+    def _next_batch(self) -> "list[dict]":
+        with self._lock:
+            return [dict(entry) for entry in list(self.pending.values())[:self.batch_size]]
+
+    def _finish(self, entry: dict, done: bool):
+        with self._lock:
+            if done:
+                self.pending.pop(entry["id"], None)
+                self._write(dict(id=entry["id"], done=True))
+            elif entry["id"] in self.pending:
+                # Move it to the back, so one failing album doesn't hold up the rest
+                current = self.pending.pop(entry["id"])
+                current["attempts"] = entry["attempts"]
+                self.pending[entry["id"]] = current
+                self._write(current)
+
+    def _release_batch(self, release: Callable[[str, bool], None],
+                       callback: Optional[Callable[[dict, Optional[Exception]], None]]) -> int:
+        batch = self._next_batch()
+
+        for entry in batch:
+            error = None
+            try:
+                release(entry["id"], entry["lossless"])
+            except requests.exceptions.RequestException as e:
+                error = e
+
+            entry["attempts"] += 1
+            self._finish(entry, done=error is None or entry["attempts"] >= MAX_ATTEMPTS)
+
+            if callback:
+                callback(entry, error)
+
+            if self.rate and self._stop.wait(60 / self.rate):
+                break
+
+        return len(batch)
+
+    def _wait_for_window(self) -> bool:
+        """
+        Waits until the time window opens. Returns `False` if stopped before then.
+        """
+        while self.window:
+            delay = seconds_until_window(self.window)
+            if not delay:
+                return True
+            if self._stop.wait(min(delay, 60)):
+                return False
+        return not self._stop.is_set()
+
+    def drain(self, release: Callable[[str, bool], None],
+              callback: Optional[Callable[[dict, Optional[Exception]], None]] = None):
+        """
+        Releases pending queue requests according to the rate, batch and window settings.
+        :param release: Called with the album ID and `lossless` of each album to queue.
+        :param callback: Optional. Called with each entry after it's released, and the error if it failed.
+        """
+        self._stop.clear()
+        self._drain(release, callback, until_empty=True)
+
+    def _drain(self, release: Callable[[str, bool], None],
+               callback: Optional[Callable[[dict, Optional[Exception]], None]], until_empty: bool):
+        while self._wait_for_window():
+            released = self._release_batch(release, callback)
+
+            if not released:
+                if until_empty:
+                    return
+                if self._stop.wait(1):
+                    return
+            elif self.batch_interval and self._stop.wait(self.batch_interval):
+                return
+
+    def start(self, release: Callable[[str, bool], None],
+              callback: Optional[Callable[[dict, Optional[Exception]], None]] = None):
+        """
+        Starts releasing queue requests in the background, while albums are still being submitted.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._drain, args=(release, callback, False), name="queue-scheduler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops releasing queue requests in the background. Anything still pending stays in the queue file.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+__all__ = ["QueueScheduler", "parse_window", "seconds_until_window"]
@@ -0,0 +1,339 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from typing import Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache import default_cache_path
+from .client import RETRY_STATUSES, BackoffRetry
+from .log import get_logger
+
+SPOTIFY_API_URL = "https://api.spotify.com/v1"
+SPOTIFY_ACCOUNTS_URL = "https://accounts.spotify.com"
+
+# The largest pages the Spotify Web API allows for each kind of request
+PLAYLIST_PAGE_SIZE = 100
+SAVED_TRACKS_PAGE_SIZE = 50
+
+# Only the fields which end up in a playlist row are requested, to keep the responses small
+PLAYLIST_TRACK_FIELDS = "items(track(type,uri,name,artists(name),album(uri,name,artists(name),release_date)))"
+
+PLAYLIST_ID_PATTERN = re.compile(r"playlist[:/]([A-Za-z0-9]+)")
+
+
+def parse_playlist_id(value: str) -> str:
+    """
+    Gets the ID of a spotify playlist from its ID, URI (`spotify:playlist:ID`) or link
+    (`https://open.spotify.com/playlist/ID`).
+    """
+    value = value.strip()
+    match = PLAYLIST_ID_PATTERN.search(value)
+    if match:
+        return match.group(1)
+    if value.isalnum():
+        return value
+    raise ValueError("Invalid spotify playlist '{}'".format(value))
+
+
+def default_source_cache_path() -> str:
+    return os.path.join(os.path.dirname(default_cache_path()), "spotify")
+
+
+def track_row(track: Optional[dict]) -> Optional[dict]:
+    """
+    Converts a track object from the Spotify Web API to a row with the same columns as an Exportify CSV playlist.
+    :return: The row, or `None` for local files and podcast episodes, which have no spotify album.
+    """
+    if not track or track.get("type", "track") != "track":
+        return None
+
+    album = track.get("album") or {}
+    if not album.get("uri"):
+        return None
+
+    return {
+        "Track URI": track.get("uri"),
+        "Track Name": track.get("name") or "",
+        "Artist Name(s)": ",".join(artist["name"] for artist in track.get("artists") or ()),
+        "Album URI": album["uri"],
+        "Album Name": album.get("name") or "",
+        "Album Artist Name(s)": ",".join(artist["name"] for artist in album.get("artists") or ()),
+        "Album Release Date": album.get("release_date") or "",
+    }
+
+
+class SpotifyClient:
+    def __init__(self, token: Optional[str] = None, client_id: Optional[str] = None,
+                 client_secret: Optional[str] = None, refresh_token: Optional[str] = None,
+                 api_url: str = SPOTIFY_API_URL, accounts_url: str = SPOTIFY_ACCOUNTS_URL, workers: int = 4,
+                 timeout: float = 30, retries: int = 3, backoff: float = 1.0):
+        """
+        A client for the Spotify Web API. Pages of a playlist are requested `workers` at a time over a shared pool of
+        connections, and requests are retried like `HeadphonesClient`'s, including when spotify rate limits them.
+        Either an access token, or a client ID and secret, are needed. With only a client ID and secret, a token is
+        requested with the client credentials flow, which can read public playlists but not saved tracks. With a
+        refresh token too, a user's token is requested, and it's refreshed whenever it expires.
+        :param token: Optional. An access token.
+        :param client_id: Optional. The client ID of a spotify application.
+        :param client_secret: Optional. The client secret of the application.
+        :param refresh_token: Optional. A refresh token for the user, issued to the application.
+        :param api_url: Optional. The base URL of the Web API.
+        :param accounts_url: Optional. The base URL of the spotify accounts service, which issues tokens.
+        :param workers: Optional. How many requests to make at the same time.
+        :param timeout: Optional. How many seconds to wait for spotify to respond.
+        :param retries: Optional. How many times to retry a failed request.
+        :param backoff: Optional. The delay before the first retry, in seconds. It doubles after each retry.
+        """
+        if not token and not (client_id and client_secret):
+            raise ValueError("A spotify access token, or a client ID and secret, are needed")
+
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.api_url = api_url.rstrip("/")
+        self.accounts_url = accounts_url.rstrip("/")
+        self.timeout = timeout
+        self._token = token
+        self._expires_at = None
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max(1, workers))
+
+        retry = BackoffRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["GET", "POST"],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers), max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _authorize(self, expired: bool = False) -> str:
+        with self._lock:
+            if self._token and not expired and (self._expires_at is None or time.monotonic() < self._expires_at):
+                return self._token
+
+            if not (self.client_id and self.client_secret):
+                # Nothing to get a new token with
+                return self._token
+
+            if self.refresh_token:
+                data = {"grant_type": "refresh_token", "refresh_token": self.refresh_token}
+            else:
+                data = {"grant_type": "client_credentials"}
+
+            response = self.session.post(
+                self.accounts_url + "/api/token",
+                data=data,
+                auth=(self.client_id, self.client_secret),
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            body = response.json()
+
+            self._token = body["access_token"]
+            # Refresh a minute early, so requests already on their way don't fail
+            self._expires_at = time.monotonic() + body.get("expires_in", 3600) - 60
+            self.refresh_token = body.get("refresh_token", self.refresh_token)
+            return self._token
+
+    def get(self, path: str, etag: Optional[str] = None, **params) -> requests.Response:
+        """
+        Sends a request to the Web API, getting a new token first if needed.
+        :param path: The path of the endpoint, e.g. `/me/tracks`.
+        :param etag: Optional. The `ETag` of a previous response. If the response would be the same, spotify responds
+                     with `304 Not Modified` instead.
+        :param params: Any query parameters.
+        :return: The response, after checking its status.
+        """
+        response = None
+        for expired in (False, True):
+            headers = {"Authorization": "Bearer {}".format(self._authorize(expired))}
+            if etag:
+                headers["If-None-Match"] = etag
+
+            response = self.session.get(self.api_url + path, params=params, headers=headers, timeout=self.timeout)
+            if response.status_code != 401 or not (self.client_id and self.client_secret):
+                break
+
+        response.raise_for_status()
+        return response
+
+    def iter_pages(self, path: str, total: int, page_size: int, first: Optional[dict] = None, **params):
+        """
+        Requests every page of a paginated endpoint, several at a time, and yields them in order.
+        :param path: The path of the endpoint.
+        :param total: The total number of items, from the first page or the object the items belong to.
+        :param page_size: The number of items per page.
+        :param first: Optional. The first page, if it was already requested.
+        :param params: Any other query parameters.
+        """
+        offsets = range(page_size if first is not None else 0, total, page_size)
+
+        if first is not None:
+            yield first
+
+        yield from self.executor.map(
+            lambda offset: self.get(path, offset=offset, limit=page_size, **params).json(), offsets
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+
+class SourceCache:
+    def __init__(self, directory: "PathLike | str"):
+        """
+        Keeps a copy of the rows of each spotify playlist, with the version of the playlist they were read from, so
+        an unchanged playlist can be read from disk instead of from spotify.
+        :param directory: The directory to keep the copies in. It will be created if it does not exist.
+        """
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(os.fspath(self.directory), "{}.jsonl".format(key))
+
+    def version(self, key: str) -> Optional[str]:
+        """
+        :return: The version of the saved copy of a playlist, or `None` if there isn't one.
+        """
+        try:
+            with open(self._path(key)) as f:
+                return json.loads(f.readline())["version"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def read(self, key: str):
+        """
+        Reads the rows of the saved copy of a playlist.
+        """
+        with open(self._path(key)) as f:
+            f.readline()
+            for line in f:
+                yield json.loads(line)
+
+    def write(self, key: str, version: str, rows: "Iterable[dict]"):
+        """
+        Saves the rows of a playlist while passing them on. The copy only replaces the previous one once every row has
+        been read, so an interrupted read leaves the previous copy in place.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        path = self._path(key)
+        tmp_path = "{}.tmp".format(path)
+        complete = False
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(json.dumps({"version": version}) + "\n")
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+                    yield row
+            complete = True
+            os.replace(tmp_path, path)
+        finally:
+            if not complete:
+                os.remove(tmp_path)
+
+
+class SpotifySource:
+    def __init__(self, client: SpotifyClient, playlists: "Iterable[str]" = (), saved_tracks: bool = False,
+                 cache: Optional[SourceCache] = None):
+        """
+        Reads playlists and saved tracks directly from the Spotify Web API, as rows with the same columns as an
+        Exportify CSV playlist, for `Importer.import_playlist`.
+        With a cache, a playlist is only requested again if its snapshot ID has changed, and saved tracks are only
+        requested again if their first page has changed. Saved tracks are ordered by when they were saved, so new ones
+        always change the first page.
+        :param client: The client to request playlists with.
+        :param playlists: Optional. The IDs, URIs or links of the playlists to read.
+        :param saved_tracks: If `True`, the user's saved tracks are read too.
+        :param cache: Optional. Where to keep a copy of each playlist.
+        """
+        self.client = client
+        self.playlists = [parse_playlist_id(playlist) for playlist in playlists]
+        self.saved_tracks = saved_tracks
+        self.cache = cache
+        self.logger = get_logger()
+
+    def iter_rows(self):
+        """
+        Yields the rows of every playlist, then those of the saved tracks. Rows are yielded as soon as their page
+        arrives.
+        """
+        for playlist_id in self.playlists:
+            yield from self._iter_playlist_rows(playlist_id)
+
+        if self.saved_tracks:
+            yield from self._iter_saved_track_rows()
+
+    def __iter__(self):
+        return self.iter_rows()
+
+    def _iter_playlist_rows(self, playlist_id: str):
+        key = "playlist-{}".format(playlist_id)
+        path = "/playlists/{}".format(playlist_id)
+
+        playlist = self.client.get(path, fields="name,snapshot_id,tracks.total").json()
+        name = playlist.get("name") or playlist_id
+        snapshot_id = playlist["snapshot_id"]
+
+        if self.cache is not None and self.cache.version(key) == snapshot_id:
+            self.logger.info("Spotify playlist '{}' is unchanged, reading the saved copy".format(name))
+            yield from self.cache.read(key)
+            return
+
+        total = playlist["tracks"]["total"]
+        self.logger.info("Loading spotify playlist '{}' ({} tracks)...".format(name, total))
+        pages = self.client.iter_pages(
+            path + "/tracks", total, PLAYLIST_PAGE_SIZE, fields=PLAYLIST_TRACK_FIELDS, additional_types="track"
+        )
+        rows = self._page_rows(pages)
+
+        if self.cache is not None:
+            rows = self.cache.write(key, snapshot_id, rows)
+
+        yield from rows
+
+    def _iter_saved_track_rows(self):
+        key = "saved-tracks"
+        etag = self.cache.version(key) if self.cache is not None else None
+
+        response = self.client.get("/me/tracks", etag=etag, offset=0, limit=SAVED_TRACKS_PAGE_SIZE)
+        if response.status_code == 304:
+            self.logger.info("Saved tracks are unchanged, reading the saved copy")
+            yield from self.cache.read(key)
+            return
+
+        first = response.json()
+        self.logger.info("Loading {} saved tracks from spotify...".format(first["total"]))
+        rows = self._page_rows(self.client.iter_pages("/me/tracks", first["total"], SAVED_TRACKS_PAGE_SIZE, first))
+
+        if self.cache is not None and response.headers.get("ETag"):
+            rows = self.cache.write(key, response.headers["ETag"], rows)
+
+        yield from rows
+
+    @staticmethod
+    def _page_rows(pages):
+        for page in pages:
+            for item in page.get("items") or ():
+                row = track_row(item.get("track"))
+                if row is not None:
+                    yield row
+
+
+__all__ = ["SourceCache", "SpotifyClient", "SpotifySource", "parse_playlist_id"]
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from os import PathLike
+from typing import Iterable, Optional
+
+from .album import Album
+
+# Statuses meaning an album no longer needs to be imported
+IMPORTED_STATUSES = ("Added", "Queued", "Queue pending", "Already present")
+
+
+class ImportState:
+    def __init__(self, path: "PathLike | str"):
+        """
+        Remembers the outcome of importing each album across runs, so later runs can skip albums that were already
+        imported. Outcomes are appended to the file as soon as they are recorded, so an interrupted run can be resumed.
+        Safe to share between threads.
+        :param path: The path of the state file. It will be created if it does not exist.
+        """
+        self.path = path
+        self.albums = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A partially written line from an interrupted run. Anything after it is still usable.
+                        continue
+
+                    self.albums[entry["uri"]] = entry
+        except FileNotFoundError:
+            pass
+
+        self.compact()
+
+    def compact(self):
+        """
+        Rewrites the state file with only the latest outcome of each album.
+        """
+        with self._lock:
+            if self._file:
+                self._file.close()
+
+            directory = os.path.dirname(os.fspath(self.path))
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            tmp_path = "{}.tmp".format(os.fspath(self.path))
+            with open(tmp_path, "w") as f:
+                for entry in self.albums.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.path)
+
+            self._file = open(self.path, "a")
+
+    def get(self, uri: str) -> Optional[dict]:
+        """
+        :param uri: The spotify album URI.
+        :return: A dict with the `status`, `musicbrainz_id` and `updated_at` of the album's last outcome, or `None`.
+                 With other servers, it also has the last status on each of them under `targets`, by server name.
+        """
+        with self._lock:
+            return self.albums.get(uri)
+
+    def is_imported(self, uri: str, statuses=IMPORTED_STATUSES) -> bool:
+        """
+        :param uri: The spotify album URI.
+        :param statuses: Optional. The statuses which count as imported.
+        :return: `True` if the last outcome for the album has one of `statuses`.
+        """
+        entry = self.get(uri)
+        return bool(entry) and entry["status"] in statuses
+
+    def record(self, album: Album):
+        """
+        Records the current status of an album and writes it to the state file immediately.
+        :param album: The album. Albums without a `uri` are ignored. Other editions merged into it are recorded too.
+        """
+        updated_at = time.time()
+
+        with self._lock:
+            for uri in album.uris:
+                entry = dict(
+                    uri=uri,
+                    name=str(album),
+                    status=album.status,
+                    musicbrainz_id=album.musicbrainz_id,
+                    updated_at=updated_at,
+                )
+                targets = self.albums.get(uri, {}).get("targets")
+                if targets:
+                    entry["targets"] = targets
+                self.albums[uri] = entry
+                self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def record_target(self, album: Album, target: str, status: str):
+        """
+        Records the status of an album on another headphones server, keeping its status on the main one.
+        :param album: The album. Other editions merged into it are recorded too.
+        :param target: The name of the server.
+        :param status: The album's status on that server.
+        """
+        updated_at = time.time()
+
+        with self._lock:
+            for uri in album.uris:
+                entry = self.albums.get(uri) or dict(
+                    uri=uri, name=str(album), status=None, musicbrainz_id=album.musicbrainz_id
+                )
+                entry = dict(entry, targets=dict(entry.get("targets") or {}, **{target: status}), updated_at=updated_at)
+                self.albums[uri] = entry
+                self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def record_status(self, uris: "Iterable[str]", status: str):
+        """
+        Records a new status for albums recorded before, e.g. by an earlier run, keeping the rest of their outcome.
+        :param uris: The spotify album URIs. Albums which were never recorded are ignored.
+        :param status: The new status.
+        """
+        updated_at = time.time()
+
+        with self._lock:
+            for uri in uris:
+                if uri not in self.albums:
+                    continue
+
+                entry = dict(self.albums[uri], status=status, updated_at=updated_at)
+                self.albums[uri] = entry
+                self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+__all__ = ["ImportState", "IMPORTED_STATUSES"]
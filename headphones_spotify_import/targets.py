@@ -0,0 +1,42 @@
+from typing import Iterable, Optional
+
+from .client import HeadphonesClient
+
+
+class ImportTarget:
+    def __init__(self, name: str, client: HeadphonesClient, queue: Optional[bool] = None,
+                 lossless: Optional[bool] = None):
+        """
+        Another headphones server to add albums to, besides the one albums are searched for on. Albums are added to it
+        with the album IDs found on the main server, so nothing is searched for twice.
+        :param name: The name of the server, for messages and summaries.
+        :param client: The client to communicate with the server through.
+        :param queue: Optional. Whether to queue albums after adding them. Defaults to what the import does.
+        :param lossless: Optional. Whether to only search for lossless versions when queueing. Defaults to what the
+                         import does.
+        """
+        self.name = name
+        self.client = client
+        self.queue = queue
+        self.lossless = lossless
+
+    def __str__(self):
+        return self.name
+
+
+def target_summary(statuses: "Iterable[str]") -> dict:
+    """
+    :param statuses: The status of each album sent to a target.
+    :return: How many albums were `added` (and not queued), `queued`, and `failed`, out of the `total` number sent
+             to the target.
+    """
+    statuses = list(statuses)
+    return dict(
+        added=sum((status == "Added" for status in statuses)),
+        queued=sum((status == "Queued" for status in statuses)),
+        failed=sum((status.startswith("Error") for status in statuses)),
+        total=len(statuses),
+    )
+
+
+__all__ = ["ImportTarget", "target_summary"]
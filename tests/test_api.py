@@ -0,0 +1,42 @@
+import unittest
+
+from benchmarks.fake_headphones import FakeHeadphones
+from benchmarks.fake_spotify import fake_track
+from headphones_spotify_import import ImportService, ImportTarget
+from headphones_spotify_import.client import HeadphonesClient
+from headphones_spotify_import.sources import track_row
+
+
+class ImportServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.main = FakeHeadphones().start()
+        self.addCleanup(self.main.stop)
+        self.backup = FakeHeadphones().start()
+        self.addCleanup(self.backup.stop)
+
+        self.rows = [track_row(fake_track(number, album=number % 3)) for number in range(6)]
+
+    def test_album_results_have_target_statuses(self):
+        client = HeadphonesClient(self.backup.url, "key", retries=0)
+        self.addCleanup(client.close)
+        target = ImportTarget("backup", client)
+
+        with ImportService(self.main.url, "key", targets=[target]) as service:
+            result = service.import_rows(self.rows)
+
+        self.assertEqual(len(result.albums), 3)
+        for album in result.albums:
+            self.assertEqual(album.status, "Added")
+            self.assertEqual(album.targets, {"backup": "Added"})
+        self.assertEqual(result.summary["targets"]["backup"]["added"], 3)
+
+    def test_album_results_without_targets(self):
+        progress = []
+        with ImportService(self.main.url, "key") as service:
+            result = service.import_rows(self.rows, progress=progress.append)
+
+        self.assertTrue(all(album.targets == {} for album in result.albums + progress))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from urllib3.util.retry import RequestHistory
+
+from benchmarks.fake_headphones import FakeHeadphones
+from headphones_spotify_import.client import BackoffRetry, HeadphonesClient
+
+
+def failed_attempts(retry: BackoffRetry, count: int) -> BackoffRetry:
+    for _ in range(count):
+        retry = retry.new(history=retry.history + (RequestHistory("GET", "/api", None, 502, None),))
+    return retry
+
+
+class BackoffRetryTest(unittest.TestCase):
+    def test_waits_before_first_retry(self):
+        retry = BackoffRetry(total=4, backoff_factor=0.5)
+
+        self.assertEqual(retry.get_backoff_time(), 0)
+        self.assertEqual(
+            [failed_attempts(retry, count).get_backoff_time() for count in range(1, 5)], [0.5, 1.0, 2.0, 4.0]
+        )
+
+    def test_without_backoff_max(self):
+        # urllib3 1.26 only has the class constant
+        retry = failed_attempts(BackoffRetry(total=20, backoff_factor=1), 12)
+        vars(retry).pop("backoff_max", None)
+
+        self.assertEqual(retry.get_backoff_time(), BackoffRetry.DEFAULT_BACKOFF_MAX)
+
+
+class HeadphonesClientTest(unittest.TestCase):
+    def test_retries_failed_requests(self):
+        with FakeHeadphones(error_rate=0.5, seed=1) as fake:
+            client = HeadphonesClient(fake.url, "key", retries=10, backoff=0.001)
+            self.addCleanup(client.close)
+
+            for _ in range(10):
+                self.assertEqual(client.get("addAlbum", id="album").json(), "OK")
+
+        self.assertGreater(fake.errors["addAlbum"], 0)
+        self.assertEqual(fake.requests["addAlbum"], 10 + fake.errors["addAlbum"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+from headphones_spotify_import.album import Album
+from headphones_spotify_import.matching import EditionIndex, strip_edition
+
+
+class StripEditionTest(unittest.TestCase):
+    def test_edition_suffixes(self):
+        for title in (
+            "Abbey Road (Remastered 2009)",
+            "Abbey Road [Deluxe Edition]",
+            "Abbey Road (Explicit Version)",
+            "Abbey Road - Deluxe Version",
+            "Abbey Road - 50th Anniversary Edition",
+        ):
+            self.assertEqual(strip_edition(title), "Abbey Road")
+
+    def test_re_recordings_are_not_editions(self):
+        self.assertEqual(strip_edition("Fearless (Taylor's Version)"), "Fearless (Taylor's Version)")
+        self.assertEqual(strip_edition("Version 2.0"), "Version 2.0")
+
+
+class EditionIndexTest(unittest.TestCase):
+    def test_merges_editions(self):
+        editions = EditionIndex()
+        album = Album("Rumours", "Fleetwood Mac", "1977", uri="spotify:album:1")
+        deluxe = Album("Rumours (Deluxe Edition)", "Fleetwood Mac", "2013", uri="spotify:album:2")
+
+        self.assertIs(editions.add(album), album)
+        self.assertIs(editions.add(deluxe), album)
+        self.assertEqual(album.uris, ("spotify:album:1", "spotify:album:2"))
+
+    def test_merges_same_year_with_different_date_precision(self):
+        editions = EditionIndex()
+        album = Album("Same", "Artist", "2008-11-11", uri="spotify:album:1")
+        other = Album("Same", "Artist", "2008", uri="spotify:album:2")
+
+        self.assertIs(editions.add(album), album)
+        self.assertIs(editions.add(other), album)
+
+    def test_keeps_same_title_from_other_years_apart(self):
+        editions = EditionIndex()
+        album = Album("Weezer", "Weezer", "1994-05-10", uri="spotify:album:1")
+        other = Album("Weezer", "Weezer", "2001", uri="spotify:album:2")
+
+        self.assertIs(editions.add(album), album)
+        self.assertIs(editions.add(other), other)
+
+    def test_keeps_re_recordings_apart(self):
+        editions = EditionIndex()
+        album = Album("Fearless", "Taylor Swift", "2008", uri="spotify:album:1")
+        re_recording = Album("Fearless (Taylor's Version)", "Taylor Swift", "2021", uri="spotify:album:2")
+
+        self.assertIs(editions.add(album), album)
+        self.assertIs(editions.add(re_recording), re_recording)
+
+
+if __name__ == "__main__":
+    unittest.main()
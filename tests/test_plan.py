@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from headphones_spotify_import.album import Album
+from headphones_spotify_import.plan import ImportPlan, write_plan
+
+
+class ImportPlanTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "plan.jsonl")
+
+        self.album = Album("Rumours", "Fleetwood Mac", "1977", uri="spotify:album:1")
+        self.album.musicbrainz_id = "mbid"
+        write_plan(self.path, [self.album], {self.album.uri: (True, False)}, queue=False, lossless=False)
+
+    def open_plan(self, targets=()) -> ImportPlan:
+        plan = ImportPlan(self.path)
+        self.addCleanup(plan.close)
+        plan.targets = set(targets)
+        return plan
+
+    def test_done_once_added(self):
+        plan = self.open_plan()
+        self.album.status = "Added"
+        plan.record(self.album)
+
+        self.assertEqual(plan.pending(), [])
+        self.assertEqual(self.open_plan().pending(), [])
+
+    def test_pending_until_every_target_has_it(self):
+        plan = self.open_plan(["backup"])
+        self.album.status = "Added"
+        plan.record(self.album)
+        plan.record_target(self.album, "backup", "Failed", done=False)
+        plan.close()
+
+        plan = self.open_plan(["backup"])
+        self.assertEqual([entry["uri"] for entry in plan.pending()], [self.album.uri])
+        self.assertEqual(plan.applied, {self.album.uri: "Added"})
+
+        plan.record_target(self.album, "backup", "Added", done=True)
+        plan.close()
+
+        self.assertEqual(self.open_plan(["backup"]).pending(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
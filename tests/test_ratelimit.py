@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+
+from headphones_spotify_import.ratelimit import AdaptiveLimiter
+
+
+def run_requests(limiter: AdaptiveLimiter, threads: int, requests: int, latency: float) -> int:
+    """
+    Makes `requests` requests through `limiter` from `threads` threads, each taking `latency` seconds, and returns the
+    highest number of requests which ran at the same time.
+    """
+    lock = threading.Lock()
+    counts = dict(started=0, running=0, peak=0)
+
+    def work():
+        while True:
+            with lock:
+                if counts["started"] >= requests:
+                    return
+                counts["started"] += 1
+
+            limiter.acquire()
+            with lock:
+                counts["running"] += 1
+                counts["peak"] = max(counts["peak"], counts["running"])
+            time.sleep(latency)
+            with lock:
+                counts["running"] -= 1
+            limiter.release(latency)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return counts["peak"]
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_concurrency_grows_to_maximum(self):
+        limiter = AdaptiveLimiter(max_concurrency=8, initial_rate=1000, latency_target=1)
+
+        peak = run_requests(limiter, threads=8, requests=480, latency=0.02)
+
+        self.assertEqual(int(limiter.concurrency), 8)
+        self.assertEqual(peak, 8)
+
+    def test_concurrency_does_not_grow_without_contention(self):
+        limiter = AdaptiveLimiter(max_concurrency=8, initial_rate=1000, latency_target=1)
+
+        run_requests(limiter, threads=1, requests=50, latency=0.001)
+
+        self.assertEqual(int(limiter.concurrency), 1)
+
+    def test_overload_cuts_limits(self):
+        limiter = AdaptiveLimiter(max_concurrency=8, initial_rate=1000, latency_target=1)
+        run_requests(limiter, threads=8, requests=200, latency=0.01)
+        rate = limiter.rate
+
+        limiter.acquire()
+        limiter.release(0.01, overloaded=True)
+
+        self.assertEqual(int(limiter.concurrency), 4)
+        self.assertAlmostEqual(limiter.rate, rate / 2)
+
+    def test_fixed_limits(self):
+        limiter = AdaptiveLimiter(max_rate=1000, max_concurrency=2, adaptive=False)
+
+        peak = run_requests(limiter, threads=4, requests=40, latency=0.01)
+
+        self.assertEqual(peak, 2)
+        self.assertEqual((limiter.rate, limiter.concurrency), (1000, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
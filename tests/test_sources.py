@@ -0,0 +1,187 @@
+import os
+import tempfile
+import unittest
+
+import requests
+
+from benchmarks.fake_spotify import FakeSpotify, fake_track
+from headphones_spotify_import.sources import (
+    PLAYLIST_PAGE_SIZE, SAVED_TRACKS_PAGE_SIZE, SourceCache, SpotifyClient, SpotifySource, parse_playlist_id, track_row
+)
+
+
+class SpotifySourceTest(unittest.TestCase):
+    def setUp(self):
+        self.spotify = FakeSpotify().start()
+        self.addCleanup(self.spotify.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = SourceCache(os.path.join(directory.name, "spotify"))
+
+        self.client = SpotifyClient(
+            client_id=self.spotify.client_id,
+            client_secret=self.spotify.client_secret,
+            api_url=self.spotify.api_url,
+            accounts_url=self.spotify.url,
+            workers=4,
+            retries=0,
+        )
+        self.addCleanup(self.client.close)
+
+    def source(self, playlists=(), saved_tracks=False, cache=True) -> SpotifySource:
+        return SpotifySource(
+            self.client, playlists=playlists, saved_tracks=saved_tracks, cache=self.cache if cache else None
+        )
+
+    def test_playlist_pages(self):
+        tracks = [fake_track(number, album=number // 10) for number in range(250)]
+        self.spotify.set_playlist("abc", tracks)
+
+        rows = list(self.source(["spotify:playlist:abc"], cache=False))
+
+        self.assertEqual([row["Track URI"] for row in rows], [track["uri"] for track in tracks])
+        self.assertEqual(sorted(self.spotify.offsets), list(range(0, 250, PLAYLIST_PAGE_SIZE)))
+        self.assertEqual(rows[0], {
+            "Track URI": "spotify:track:0",
+            "Track Name": "Track 0",
+            "Artist Name(s)": "Artist 0",
+            "Album URI": "spotify:album:0",
+            "Album Name": "Album 0",
+            "Album Artist Name(s)": "Artist 0",
+            "Album Release Date": "1960-01-01",
+        })
+
+    def test_empty_playlist(self):
+        self.spotify.set_playlist("abc", [])
+
+        self.assertEqual(list(self.source(["abc"])), [])
+        self.assertEqual(self.spotify.requests["playlist_tracks"], 0)
+
+    def test_unchanged_playlist_is_read_from_cache(self):
+        self.spotify.set_playlist("abc", [fake_track(number, album=1) for number in range(120)])
+
+        first = list(self.source(["abc"]))
+        requested = self.spotify.requests["playlist_tracks"]
+        second = list(self.source(["abc"]))
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.spotify.requests["playlist_tracks"], requested)
+
+    def test_changed_playlist_is_requested_again(self):
+        self.spotify.set_playlist("abc", [fake_track(number, album=1) for number in range(10)])
+        list(self.source(["abc"]))
+
+        self.spotify.set_playlist("abc", [fake_track(number, album=2) for number in range(20)])
+        rows = list(self.source(["abc"]))
+
+        self.assertEqual(len(rows), 20)
+        self.assertEqual({row["Album URI"] for row in rows}, {"spotify:album:2"})
+        self.assertEqual(self.spotify.requests["playlist_tracks"], 2)
+
+    def test_unchanged_saved_tracks_are_read_from_cache(self):
+        self.spotify.set_saved_tracks([fake_track(number, album=number % 7) for number in range(120)])
+
+        first = list(self.source(saved_tracks=True))
+        self.assertEqual(len(first), 120)
+        self.assertEqual(sorted(self.spotify.offsets), list(range(0, 120, SAVED_TRACKS_PAGE_SIZE)))
+
+        second = list(self.source(saved_tracks=True))
+        self.assertEqual(first, second)
+        self.assertEqual(self.spotify.requests["saved_tracks_not_modified"], 1)
+        self.assertEqual(self.spotify.requests["saved_tracks"], 3)
+
+    def test_changed_saved_tracks_are_requested_again(self):
+        self.spotify.set_saved_tracks([fake_track(1, album=1)])
+        list(self.source(saved_tracks=True))
+
+        self.spotify.set_saved_tracks([fake_track(2, album=2), fake_track(1, album=1)])
+        rows = list(self.source(saved_tracks=True))
+
+        self.assertEqual([row["Track URI"] for row in rows], ["spotify:track:2", "spotify:track:1"])
+        self.assertEqual(self.spotify.requests["saved_tracks_not_modified"], 0)
+
+    def test_expired_token_is_refreshed(self):
+        self.spotify.set_playlist("abc", [fake_track(1, album=1)])
+        list(self.source(["abc"], cache=False))
+        self.assertEqual(self.spotify.requests["token"], 1)
+
+        self.spotify.expire_token()
+        rows = list(self.source(["abc"], cache=False))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(self.spotify.requests["token"], 2)
+
+    def test_expired_token_without_credentials(self):
+        self.spotify.set_playlist("abc", [fake_track(1, album=1)])
+        client = SpotifyClient(token="stale", api_url=self.spotify.api_url, accounts_url=self.spotify.url, retries=0)
+        self.addCleanup(client.close)
+
+        with self.assertRaises(requests.HTTPError) as context:
+            list(SpotifySource(client, playlists=["abc"]))
+        self.assertEqual(context.exception.response.status_code, 401)
+        self.assertEqual(self.spotify.requests["token"], 0)
+
+
+class SourceCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = SourceCache(self.directory)
+
+    def test_write_and_read(self):
+        rows = [{"Track URI": "spotify:track:{}".format(number)} for number in range(3)]
+
+        self.assertEqual(list(self.cache.write("key", "v1", rows)), rows)
+        self.assertEqual(self.cache.version("key"), "v1")
+        self.assertEqual(list(self.cache.read("key")), rows)
+
+    def test_missing_copy_has_no_version(self):
+        self.assertIsNone(self.cache.version("key"))
+
+    def test_failed_write_keeps_previous_copy(self):
+        list(self.cache.write("key", "v1", [{"row": 1}]))
+
+        def failing_rows():
+            yield {"row": 2}
+            raise requests.ConnectionError("connection lost")
+
+        with self.assertRaises(requests.ConnectionError):
+            list(self.cache.write("key", "v2", failing_rows()))
+
+        self.assertEqual(self.cache.version("key"), "v1")
+        self.assertEqual(list(self.cache.read("key")), [{"row": 1}])
+        self.assertEqual(os.listdir(self.directory), ["key.jsonl"])
+
+    def test_abandoned_write_keeps_previous_copy(self):
+        list(self.cache.write("key", "v1", [{"row": 1}]))
+
+        rows = self.cache.write("key", "v2", [{"row": 2}, {"row": 3}])
+        next(rows)
+        rows.close()
+
+        self.assertEqual(self.cache.version("key"), "v1")
+        self.assertEqual(os.listdir(self.directory), ["key.jsonl"])
+
+
+class ParseTest(unittest.TestCase):
+    def test_parse_playlist_id(self):
+        for value in (
+            "37i9dQZF1DXcBWIGoYBM5M",
+            "spotify:playlist:37i9dQZF1DXcBWIGoYBM5M",
+            "https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M?si=abc",
+        ):
+            self.assertEqual(parse_playlist_id(value), "37i9dQZF1DXcBWIGoYBM5M")
+
+        with self.assertRaises(ValueError):
+            parse_playlist_id("https://open.spotify.com/album/abc")
+
+    def test_track_row_skips_tracks_without_albums(self):
+        self.assertIsNone(track_row(None))
+        self.assertIsNone(track_row({"type": "episode", "uri": "spotify:episode:1"}))
+        self.assertIsNone(track_row(dict(fake_track(1, album=1), album={"uri": None, "name": "Local file"})))
+
+
+if __name__ == "__main__":
+    unittest.main()